@@ -8,13 +8,19 @@ Name developers
 """
 
 import math
-import random
 
-from mesa import Agent
+from auction_ABM.agents.trader import Trader, BUYER, SELLER, ZI, ZI_C, KAPLAN, ZIP
 
-class ZI_buy(Agent):
+class ZI_buy(Trader):
     market_side = "buyer"
     strategy = "ZI"
+    side = BUYER
+    code = ZI
+    __slots__ = (
+        "valuation", "tot_commodities", "quantity", "prev_quantity", "budget", "eq_surplus",
+        "surplus", "prev_surplus", "profit_dispersion", "offer", "in_market", "active",
+        "no_transactions"
+    )
 
     def __init__(self, unique_id, model, valuation, eq_surplus, commodities):
         super().__init__(unique_id, model)
@@ -35,6 +41,17 @@ class ZI_buy(Agent):
         self.active = True
         self.no_transactions = 0
 
+    def take_over(self, agent):
+        """
+        Takes over the place of another trader in the market, such that an
+        unused trader can be reused when an agent switches strategy
+        """
+        self.unique_id = agent.unique_id
+        self.valuation = agent.valuation
+        self.tot_commodities = agent.tot_commodities
+        self.eq_surplus = agent.eq_surplus
+        self.profit_dispersion = 0
+
     def get_info(self):
         """
         Returns a formatted string containing the current state of agent
@@ -99,6 +116,22 @@ class ZI_buy(Agent):
         """
         return self.active
 
+    def idle_steps(self):
+        """
+        Returns the amount of steps (from the current one) the buyer stays 
+        inactive while no agent can shout: its activity does not depend on
+        time, so it stays inactive
+        """
+        return math.inf
+
+    def get_activity_threshold(self):
+        """
+        Returns the value the best bid has to stay below for the buyer to be
+        active (as long as it still has commodities), None if its activity
+        depends on more than the best bid
+        """
+        return math.inf
+
     def get_price(self):
         """
         Get current limit price
@@ -121,11 +154,11 @@ class ZI_buy(Agent):
         """
         self.no_transactions = 0
 
-    def update_no_transactions(self):
+    def update_no_transactions(self, steps=1):
         """
         Updates the numbers of steps with no transaction
         """
-        self.no_transactions += 1
+        self.no_transactions += steps
 
     def set_profit_dispersion(self):
         """
@@ -137,7 +170,10 @@ class ZI_buy(Agent):
         Shouts price.
         """
         # self.offer = random.randint(self.model.best_bid + 1, self.model.max_poss_price)
-        self.offer = random.uniform(self.model.best_bid + 0.01, self.model.max_poss_price)
+        low = self.model.best_bid + 0.01
+
+        # the scaling of the buffered uniform is inlined (as at all call sites) to save a call per shout
+        self.offer = low + (self.model.max_poss_price - low) * self.model.next_uniform()
         return self.offer
 
     def transaction_update(self, price):
@@ -194,6 +230,9 @@ class ZI_C_buy(ZI_buy):
     """
     market_side = "buyer"
     strategy = "ZI_C"
+    side = BUYER
+    code = ZI_C
+    __slots__ = ()
 
     def willing_to_shout(self):
         """
@@ -214,6 +253,13 @@ class ZI_C_buy(ZI_buy):
         else:
             self.active = False
 
+    def get_activity_threshold(self):
+        """
+        Returns the value the best bid has to stay below for the buyer to be
+        active: its valuation constrained by its budget
+        """
+        return min(self.valuation, self.budget)
+
     def offer_price(self):
         """
         Generates a random bod between the limit price/budget and current best bid
@@ -221,7 +267,8 @@ class ZI_C_buy(ZI_buy):
         # valuation = self.prices[self.quantity]
         max_bid = self.valuation if self.budget > self.valuation else self.budget
         # self.offer = random.randint(self.model.best_bid + 1, max_bid)
-        self.offer = random.uniform(self.model.best_bid + 0.01, max_bid)
+        low = self.model.best_bid + 0.01
+        self.offer = low + (max_bid - low) * self.model.next_uniform()
 
         return self.offer
 
@@ -231,13 +278,20 @@ class ZIP_buy(ZI_C_buy):
     """
     market_side = "buyer"
     strategy = "ZIP"
+    side = BUYER
+    code = ZIP
+    __slots__ = (
+        "profit_margin", "learning_rate", "momentum_coeff", "momentum",
+        "decreasing_rel_target", "increasing_rel_target", "decreasing_abs_target",
+        "increasing_abs_target"
+    )
 
     def __init__(self, unique_id, model, valuation, eq_surplus, commodities, params):
         super().__init__(unique_id, model, valuation, eq_surplus, commodities)
-        self.profit_margin = random.uniform(*params["profit_margin_buyers"])
-        # self.profit_margins = [random.uniform(*params["profit_margin_buyers"]) for _ in range(self.tot_commodities)]
-        self.learning_rate = random.uniform(*params["learning_rate"])
-        self.momentum_coeff = random.uniform(*params["momentum_coeff"])
+        self.profit_margin = self.model.random.uniform(*params["profit_margin_buyers"])
+        # self.profit_margins = [self.model.random.uniform(*params["profit_margin_buyers"]) for _ in range(self.tot_commodities)]
+        self.learning_rate = self.model.random.uniform(*params["learning_rate"])
+        self.momentum_coeff = self.model.random.uniform(*params["momentum_coeff"])
         self.momentum = 0
         # self.momentum = [0] * self.tot_commodities
         self.decreasing_rel_target = params["decreasing_rel_target"]
@@ -297,6 +351,20 @@ class ZIP_buy(ZI_C_buy):
         enough_budget = self.model.best_bid < self.budget
         return is_endowed and is_offer_better and enough_budget
 
+    def idle_steps(self):
+        """
+        Returns the amount of steps (from the current one) the buyer stays 
+        inactive while no agent can shout: its profit margin may change every
+        step as long as it is in the market
+        """
+        return 0 if self.in_market else math.inf
+
+    def get_activity_threshold(self):
+        """
+        Activity also depends on the profit margin, so no fixed threshold
+        """
+        return None
+
     def offer_price(self):
         """
         Generates an ask
@@ -337,12 +405,16 @@ class ZIP_buy(ZI_C_buy):
         """
         """
         if move == "increase":
-            r = random.uniform(*self.decreasing_rel_target)
-            a = random.uniform(*self.decreasing_abs_target)
+            low, high = self.decreasing_rel_target
+            r = low + (high - low) * self.model.next_uniform()
+            low, high = self.decreasing_abs_target
+            a = low + (high - low) * self.model.next_uniform()
             return r * last_shout + a
 
-        r = random.uniform(*self.increasing_rel_target)
-        a = random.uniform(*self.increasing_abs_target)
+        low, high = self.increasing_rel_target
+        r = low + (high - low) * self.model.next_uniform()
+        low, high = self.increasing_abs_target
+        a = low + (high - low) * self.model.next_uniform()
         return  r * last_shout + a
 
     def widrow_holf_delta(self, target_price, offer):
@@ -403,7 +475,7 @@ class ZIP_buy(ZI_C_buy):
         """
 
         offer = self.offer_price()
-        side_last_offer = self.model.agent_last_offer.market_side.lower()
+        side_last_offer = self.model.agent_last_offer.side
 
         # for quantity in range(self.tot_commodities):
             # offer = self.prices[quantity] * (1 + self.profit_margins[quantity])
@@ -415,14 +487,14 @@ class ZIP_buy(ZI_C_buy):
                 # self.adjust_profit_margin("increase", quantity, offer, self.model.transaction_price)
 
             # lower profit margin
-            elif side_last_offer == "seller" and offer <= self.model.transaction_price and self.in_market:
+            elif side_last_offer == SELLER and offer <= self.model.transaction_price and self.in_market:
                 self.adjust_profit_margin("decrease", offer, self.model.transaction_price)
                 # self.adjust_profit_margin("decrease", quantity, offer, self.model.transaction_price)
 
         else:
 
             # lower profit margin
-            if side_last_offer == "buyer" and offer <= self.model.agent_last_offer.offer and self.in_market:
+            if side_last_offer == BUYER and offer <= self.model.agent_last_offer.offer and self.in_market:
                 self.adjust_profit_margin("decrease", offer, self.model.agent_last_offer.offer)
                 # self.adjust_profit_margin("decrease", quantity, offer, self.model.agent_last_offer.offer)
 
@@ -440,6 +512,9 @@ class Kaplan_buy(ZI_buy):
     """
     market_side = "buyer"
     strategy = "KAPLAN"
+    side = BUYER
+    code = KAPLAN
+    __slots__ = ("spread_ratio", "profit_perc", "time_frac", "most")
 
     def __init__(self, unique_id, model, valuation, eq_surplus, commodities, params):
         super().__init__(unique_id, model, valuation, eq_surplus, commodities)
@@ -512,33 +587,49 @@ class Kaplan_buy(ZI_buy):
         Determines if the best ask is less than the minimum trade price trade 
         price in the previous period.
         """
-        return self.model.best_ask < self.model.prev_min_trade
+        return self.model.market_context.buyers_juicy_offer
 
     def is_small_spread(self):
         """
         Determines if reasonalbe offer has been made, bid-ask spread is small enough
         and the expected profit is sufficient.
         """
-        reasonable_offer = self.model.best_ask < self.model.prev_max_trade
-        small_spread = self.model.best_ask - self.model.best_bid < self.spread_ratio * self.model.best_ask
+        context = self.model.market_context
+        if not context.buyers_reasonable_offer:
+            return False
+
+        small_spread = context.spread < self.spread_ratio * self.model.best_ask
         # valuation = self.prices[self.quantity]
         expected_profit = self.valuation - self.model.best_ask > (1 - self.profit_perc) * self.valuation
 
-        return reasonable_offer and small_spread and expected_profit
+        return small_spread and expected_profit
 
-    def is_time_out(self):
+    def is_time_out(self, steps=0):
         """
-        Determines if time is almost running out, otherwise False.
+        Determines if time is almost running out, otherwise False. Optionally
+        for the given amount of steps (without transactions) from now, the
+        current step is read from the market context.
         """
-        return 1 - self.model.time / self.model.total_time < self.time_frac
+        if steps == 0:
+            return self.model.market_context.time_left < self.time_frac
+
+        return 1 - (self.model.time + steps) / self.model.total_time < self.time_frac
 
-    def is_truthteller(self):
+    def is_truthteller(self, steps=0):
         """
-        Determines if the agent wants to switch to truthtelling mode
+        Determines if the agent wants to switch to truthtelling mode. 
+        Optionally for the given amount of steps (without transactions) from now,
+        the current step is read from the market context.
         """
-        remaining_steps = self.model.total_time - self.model.time
-        exceeds_half = self.model.no_transactions > 0.5 * remaining_steps
-        exceeds_twothird = self.model.no_transactions > 5 and self.no_transactions > 2 / 3 * remaining_steps
+        if steps == 0:
+            context = self.model.market_context
+            exceeds_twothird = context.many_no_transactions and self.no_transactions > context.twothird_remaining
+            return context.exceeds_half or exceeds_twothird
+
+        remaining_steps = self.model.total_time - self.model.time - steps
+        no_transactions = self.model.no_transactions + steps
+        exceeds_half = no_transactions > 0.5 * remaining_steps
+        exceeds_twothird = no_transactions > 5 and self.no_transactions + steps > 2 / 3 * remaining_steps
         
         return exceeds_half or exceeds_twothird
 
@@ -548,15 +639,43 @@ class Kaplan_buy(ZI_buy):
         without losses
         """
         if self.model.best_bid != 0:
-            can_shout = self.willing_to_shout()
-            juicy_offer = self.is_juicy_offer()
-            small_spread = self.is_small_spread()
-            time_out = self.is_time_out()
-            truthteller = self.is_truthteller()
-            self.active = can_shout and (juicy_offer or small_spread or time_out or truthteller)
+            self.active = self.willing_to_shout() and (
+                self.is_juicy_offer() or self.is_small_spread()
+                or self.is_time_out() or self.is_truthteller()
+            )
         else:
             self.active = True
 
+    def idle_steps(self):
+        """
+        Returns the amount of steps (from the current one) the buyer stays 
+        inactive while no agent can shout. Only the time out and truthtelling
+        mode change with time, the first step in which either holds is found 
+        by bisection (both only become True as time passes).
+        """
+        if not self.in_market:
+            return math.inf
+        if self.model.best_bid == 0:
+            return 0
+        if not self.willing_to_shout():
+            return math.inf
+
+        low, high = 0, self.model.total_time - self.model.time
+        while low < high:
+            steps = (low + high) // 2
+            if self.is_time_out(steps) or self.is_truthteller(steps):
+                high = steps
+            else:
+                low = steps + 1
+
+        return low
+
+    def get_activity_threshold(self):
+        """
+        Activity also depends on the time and spread, so no fixed threshold
+        """
+        return None
+
     def offer_price(self):
         """
         Generates a bid
@@ -8,13 +8,19 @@ Name developers
 """
 
 import math
-import random
 
-from mesa import Agent
+from auction_ABM.agents.trader import Trader, BUYER, SELLER, ZI, ZI_C, KAPLAN, ZIP
 
-class ZI_sell(Agent):
+class ZI_sell(Trader):
     market_side = "seller"
     strategy = "ZI"
+    side = SELLER
+    code = ZI
+    __slots__ = (
+        "valuation", "tot_commodities", "quantity", "prev_quantity", "budget", "eq_surplus",
+        "surplus", "prev_surplus", "profit_dispersion", "offer", "in_market", "active",
+        "no_transactions"
+    )
 
     def __init__(self, unique_id, model, valuation, eq_surplus, commodities):
         super().__init__(unique_id, model)
@@ -34,6 +40,17 @@ class ZI_sell(Agent):
         self.active = True
         self.no_transactions = 0
 
+    def take_over(self, agent):
+        """
+        Takes over the place of another trader in the market, such that an
+        unused trader can be reused when an agent switches strategy
+        """
+        self.unique_id = agent.unique_id
+        self.valuation = agent.valuation
+        self.tot_commodities = agent.tot_commodities
+        self.eq_surplus = agent.eq_surplus
+        self.profit_dispersion = 0
+
     def get_info(self):
         """
         Returns a formatted string containing the current state of agent
@@ -98,6 +115,22 @@ class ZI_sell(Agent):
         """
         return self.active
 
+    def idle_steps(self):
+        """
+        Returns the amount of steps (from the current one) the seller stays 
+        inactive while no agent can shout: its activity does not depend on
+        time, so it stays inactive
+        """
+        return math.inf
+
+    def get_activity_threshold(self):
+        """
+        Returns the value the best ask has to stay above for the seller to be
+        active (as long as it still has commodities), None if its activity
+        depends on more than the best ask
+        """
+        return -math.inf
+
     def get_price(self):
         """
         Get current limit price
@@ -120,11 +153,11 @@ class ZI_sell(Agent):
         """
         self.no_transactions = 0
 
-    def update_no_transactions(self):
+    def update_no_transactions(self, steps=1):
         """
         Updates the numbers of steps with no transaction
         """
-        self.no_transactions += 1
+        self.no_transactions += steps
 
     def set_profit_dispersion(self):
         """
@@ -137,10 +170,12 @@ class ZI_sell(Agent):
         """
         if self.model.best_ask == math.inf:
             # self.offer = random.randint(self.model.min_poss_price, self.model.max_poss_price)
-            self.offer = random.uniform(self.model.min_poss_price, self.model.max_poss_price)
+            low = self.model.min_poss_price
+            self.offer = low + (self.model.max_poss_price - low) * self.model.next_uniform()
         else:
             # self.offer = random.randint(self.model.min_poss_price, self.model.best_ask - 1)
-            self.offer = random.uniform(self.model.min_poss_price, self.model.best_ask - 0.01)
+            low = self.model.min_poss_price
+            self.offer = low + (self.model.best_ask - 0.01 - low) * self.model.next_uniform()
 
         return self.offer
 
@@ -197,6 +232,9 @@ class ZI_C_sell(ZI_sell):
     """
     market_side = "seller"
     strategy = "ZI_C"
+    side = SELLER
+    code = ZI_C
+    __slots__ = ()
 
     def willing_to_shout(self):
         """
@@ -211,14 +249,23 @@ class ZI_C_sell(ZI_sell):
         else:
             self.active = False
 
+    def get_activity_threshold(self):
+        """
+        Returns the value the best ask has to stay above for the seller to be
+        active: its valuation
+        """
+        return self.valuation
+
     def offer_price(self):
         # valuation = self.prices[self.quantity]
         if self.model.best_ask == math.inf:
             # self.offer = random.randint(valuation, self.model.max_poss_price)
-            self.offer = random.uniform(self.valuation, self.model.max_poss_price)
+            low = self.valuation
+            self.offer = low + (self.model.max_poss_price - low) * self.model.next_uniform()
         else:
             # self.offer = random.randint(valuation, self.model.best_ask - 1)
-            self.offer = random.uniform(self.valuation, self.model.best_ask - 0.01)
+            low = self.valuation
+            self.offer = low + (self.model.best_ask - 0.01 - low) * self.model.next_uniform()
 
         return self.offer
 
@@ -228,13 +275,20 @@ class ZIP_sell(ZI_C_sell):
     """
     market_side = "seller"
     strategy = "ZIP"
+    side = SELLER
+    code = ZIP
+    __slots__ = (
+        "profit_margin", "learning_rate", "momentum_coeff", "momentum",
+        "decreasing_rel_target", "increasing_rel_target", "decreasing_abs_target",
+        "increasing_abs_target"
+    )
 
     def __init__(self, unique_id, model, valuation, eq_surplus, commodities, params):
         super().__init__(unique_id, model, valuation, eq_surplus, commodities)
-        self.profit_margin = random.uniform(*params["profit_margin_sellers"])
-        # self.profit_margins = [random.uniform(*params["profit_margin_sellers"]) for _ in range(self.tot_commodities)]
-        self.learning_rate = random.uniform(*params["learning_rate"])
-        self.momentum_coeff = random.uniform(*params["momentum_coeff"])
+        self.profit_margin = self.model.random.uniform(*params["profit_margin_sellers"])
+        # self.profit_margins = [self.model.random.uniform(*params["profit_margin_sellers"]) for _ in range(self.tot_commodities)]
+        self.learning_rate = self.model.random.uniform(*params["learning_rate"])
+        self.momentum_coeff = self.model.random.uniform(*params["momentum_coeff"])
         self.momentum = 0
         # self.momentum = [0] * self.tot_commodities
         self.decreasing_rel_target = params["decreasing_rel_target"]
@@ -293,6 +347,20 @@ class ZIP_sell(ZI_C_sell):
         is_better_ask = offer < self.model.best_ask
         return is_endowed and is_better_ask
 
+    def idle_steps(self):
+        """
+        Returns the amount of steps (from the current one) the seller stays 
+        inactive while no agent can shout: its profit margin may change every
+        step as long as it is in the market
+        """
+        return 0 if self.in_market else math.inf
+
+    def get_activity_threshold(self):
+        """
+        Activity also depends on the profit margin, so no fixed threshold
+        """
+        return None
+
     def offer_price(self):
         """
         Generates an ask
@@ -324,12 +392,16 @@ class ZIP_sell(ZI_C_sell):
         """
         """
         if move == "increase":
-            r = random.uniform(*self.increasing_rel_target)
-            a = random.uniform(*self.increasing_abs_target)
+            low, high = self.increasing_rel_target
+            r = low + (high - low) * self.model.next_uniform()
+            low, high = self.increasing_abs_target
+            a = low + (high - low) * self.model.next_uniform()
             return r * last_shout + a
 
-        r = random.uniform(*self.decreasing_rel_target)
-        a = random.uniform(*self.decreasing_abs_target)
+        low, high = self.decreasing_rel_target
+        r = low + (high - low) * self.model.next_uniform()
+        low, high = self.decreasing_abs_target
+        a = low + (high - low) * self.model.next_uniform()
         return  r * last_shout + a
 
     def widrow_holf_delta(self, target_price, offer):
@@ -394,7 +466,7 @@ class ZIP_sell(ZI_C_sell):
         """
 
         offer = self.offer_price()
-        side_last_offer = self.model.agent_last_offer.market_side.lower()
+        side_last_offer = self.model.agent_last_offer.side
 
         # for quantity in range(self.tot_commodities):
         # offer = self.prices[quantity] * (1 + self.profit_margins[quantity])
@@ -407,14 +479,14 @@ class ZIP_sell(ZI_C_sell):
                 # self.adjust_profit_margin("increase", quantity, offer, self.model.transaction_price)
 
             # lower profit margin
-            elif side_last_offer == "buyer" and offer >= self.model.transaction_price and self.in_market:
+            elif side_last_offer == BUYER and offer >= self.model.transaction_price and self.in_market:
                 self.adjust_profit_margin("decrease", offer, self.model.transaction_price)
                 # self.adjust_profit_margin("decrease", quantity, offer, self.model.transaction_price)
 
         else:
 
             # lower profit margin
-            if side_last_offer == "seller" and offer >= self.model.agent_last_offer.offer and self.in_market:
+            if side_last_offer == SELLER and offer >= self.model.agent_last_offer.offer and self.in_market:
                 self.adjust_profit_margin("decrease", offer, self.model.agent_last_offer.offer)
                 # self.adjust_profit_margin("decrease", quantity, offer, self.model.agent_last_offer.offer)
 
@@ -432,6 +504,9 @@ class Kaplan_sell(ZI_sell):
     """
     market_side = "seller"
     strategy = "KAPLAN"
+    side = SELLER
+    code = KAPLAN
+    __slots__ = ("spread_ratio", "profit_perc", "time_frac", "most")
 
     def __init__(self, unique_id, model, valuation, eq_surplus, commodities, params):
         super().__init__(unique_id, model, valuation, eq_surplus, commodities)
@@ -502,33 +577,49 @@ class Kaplan_sell(ZI_sell):
         Determines if the best ask is less than the minimum trade price trade 
         price in the previous period.
         """
-        return self.model.best_bid > self.model.prev_max_trade
+        return self.model.market_context.sellers_juicy_offer
 
     def is_small_spread(self):
         """
         Determines if reasonalbe offer has been made, bid-ask spread is small enough
         and the expected profit is sufficient.
         """
-        reasonable_offer = self.model.best_bid > self.model.prev_min_trade
-        small_spread = self.model.best_ask - self.model.best_bid < self.spread_ratio * self.model.best_bid
+        context = self.model.market_context
+        if not context.sellers_reasonable_offer:
+            return False
+
+        small_spread = context.spread < self.spread_ratio * self.model.best_bid
         # valuation  = self.prices[self.quantity]
         expected_profit = self.model.best_bid - self.valuation > (1 + self.profit_perc) * self.valuation
 
-        return reasonable_offer and small_spread and expected_profit
+        return small_spread and expected_profit
 
-    def is_time_out(self):
+    def is_time_out(self, steps=0):
         """
-        Determines if time is almost running out, otherwise False.
+        Determines if time is almost running out, otherwise False. Optionally
+        for the given amount of steps (without transactions) from now, the
+        current step is read from the market context.
         """
-        return 1 - self.model.time / self.model.total_time < self.time_frac
+        if steps == 0:
+            return self.model.market_context.time_left < self.time_frac
+
+        return 1 - (self.model.time + steps) / self.model.total_time < self.time_frac
 
-    def is_truthteller(self):
+    def is_truthteller(self, steps=0):
         """
-        Determines if the agent wants to switch to truthtelling mode
+        Determines if the agent wants to switch to truthtelling mode. 
+        Optionally for the given amount of steps (without transactions) from now,
+        the current step is read from the market context.
         """
-        remaining_steps = self.model.total_time - self.model.time
-        exceeds_half = self.model.no_transactions > 0.5 * remaining_steps
-        exceeds_twothird = self.model.no_transactions > 5 and self.no_transactions > 2 / 3 * remaining_steps
+        if steps == 0:
+            context = self.model.market_context
+            exceeds_twothird = context.many_no_transactions and self.no_transactions > context.twothird_remaining
+            return context.exceeds_half or exceeds_twothird
+
+        remaining_steps = self.model.total_time - self.model.time - steps
+        no_transactions = self.model.no_transactions + steps
+        exceeds_half = no_transactions > 0.5 * remaining_steps
+        exceeds_twothird = no_transactions > 5 and self.no_transactions + steps > 2 / 3 * remaining_steps
         
         return exceeds_half or exceeds_twothird
 
@@ -538,15 +629,43 @@ class Kaplan_sell(ZI_sell):
         without losses
         """
         if self.model.best_ask != math.inf:
-            can_shout = self.willing_to_shout()
-            juicy_offer = self.is_juicy_offer()
-            small_spread = self.is_small_spread()
-            time_out = self.is_time_out()
-            truthteller = self.is_truthteller()
-            self.active = can_shout and (juicy_offer or small_spread or time_out or truthteller)
+            self.active = self.willing_to_shout() and (
+                self.is_juicy_offer() or self.is_small_spread()
+                or self.is_time_out() or self.is_truthteller()
+            )
         else:
             self.active = True
 
+    def idle_steps(self):
+        """
+        Returns the amount of steps (from the current one) the seller stays 
+        inactive while no agent can shout. Only the time out and truthtelling
+        mode change with time, the first step in which either holds is found 
+        by bisection (both only become True as time passes).
+        """
+        if not self.in_market:
+            return math.inf
+        if self.model.best_ask == math.inf:
+            return 0
+        if not self.willing_to_shout():
+            return math.inf
+
+        low, high = 0, self.model.total_time - self.model.time
+        while low < high:
+            steps = (low + high) // 2
+            if self.is_time_out(steps) or self.is_truthteller(steps):
+                high = steps
+            else:
+                low = steps + 1
+
+        return low
+
+    def get_activity_threshold(self):
+        """
+        Activity also depends on the time and spread, so no fixed threshold
+        """
+        return None
+
     def offer_price(self):
         """
         Generates a ask
@@ -8,13 +8,20 @@ Name developers
 """
 
 import math
-import random
 
-from mesa import Agent
+from auction_ABM.agents.trader import Trader, BUYER, SELLER, ZI, ZI_C, KAPLAN, ZIP
 
-class ZI_sell(Agent):
+class ZI_sell(Trader):
     market_side = "seller"
     strategy = "ZI"
+    side = SELLER
+    code = ZI
+    __slots__ = (
+        "prices", "tot_commodities", "quantity", "prev_quantity", "budget", "eq_surplus",
+        "surplus", "prev_surplus", "profit_dispersion", "offer", "in_market", "active",
+        "no_transactions"
+    )
+    learning = False
 
     def __init__(self, unique_id, model, prices, eq_surplus):
         super().__init__(unique_id, model)
@@ -32,6 +39,17 @@ class ZI_sell(Agent):
         self.active = True
         self.no_transactions = 0
 
+    def take_over(self, agent):
+        """
+        Takes over the place of another trader in the market, such that an
+        unused trader can be reused when an agent switches strategy
+        """
+        self.unique_id = agent.unique_id
+        self.prices = agent.prices
+        self.tot_commodities = len(agent.prices)
+        self.eq_surplus = agent.eq_surplus
+        self.profit_dispersion = 0
+
     def get_info(self):
         """
         Returns a formatted string containing the current state of agent
@@ -144,9 +162,11 @@ class ZI_sell(Agent):
         Shouts price.
         """
         if self.model.best_ask == math.inf:
-            self.offer = random.uniform(self.model.min_poss_price, self.model.max_poss_price)
+            low = self.model.min_poss_price
+            self.offer = low + (self.model.max_poss_price - low) * self.model.next_uniform()
         else:
-            self.offer = random.uniform(self.model.min_poss_price, self.model.best_ask - 0.01)
+            low = self.model.min_poss_price
+            self.offer = low + (self.model.best_ask - 0.01 - low) * self.model.next_uniform()
 
         return self.offer
 
@@ -202,6 +222,9 @@ class ZI_C_sell(ZI_sell):
     """
     market_side = "seller"
     strategy = "ZI_C"
+    side = SELLER
+    code = ZI_C
+    __slots__ = ()
 
     def willing_to_shout(self):
         """
@@ -218,9 +241,11 @@ class ZI_C_sell(ZI_sell):
     def offer_price(self):
         valuation = self.prices[self.quantity]
         if self.model.best_ask == math.inf:
-            self.offer = random.uniform(valuation, self.model.max_poss_price)
+            low = valuation
+            self.offer = low + (self.model.max_poss_price - low) * self.model.next_uniform()
         else:
-            self.offer = random.uniform(valuation, self.model.best_ask - 0.01)
+            low = valuation
+            self.offer = low + (self.model.best_ask - 0.01 - low) * self.model.next_uniform()
 
         return self.offer
 
@@ -230,12 +255,20 @@ class ZIP_sell(ZI_C_sell):
     """
     market_side = "seller"
     strategy = "ZIP"
+    side = SELLER
+    code = ZIP
+    __slots__ = (
+        "profit_margins", "learning_rate", "momentum_coeff", "momentum",
+        "decreasing_rel_target", "increasing_rel_target", "decreasing_abs_target",
+        "increasing_abs_target"
+    )
+    learning = True
 
     def __init__(self, unique_id, model, prices, eq_surplus, params):
         super().__init__(unique_id, model, prices, eq_surplus)
-        self.profit_margins = [random.uniform(*params["profit_margin_sellers"]) for _ in range(self.tot_commodities)]
-        self.learning_rate = random.uniform(*params["learning_rate"])
-        self.momentum_coeff = random.uniform(*params["momentum_coeff"])
+        self.profit_margins = [self.model.random.uniform(*params["profit_margin_sellers"]) for _ in range(self.tot_commodities)]
+        self.learning_rate = self.model.random.uniform(*params["learning_rate"])
+        self.momentum_coeff = self.model.random.uniform(*params["momentum_coeff"])
         self.momentum = [0] * self.tot_commodities
         self.decreasing_rel_target = params["decreasing_rel_target"]
         self.increasing_rel_target = params["increasing_rel_target"]
@@ -307,12 +340,16 @@ class ZIP_sell(ZI_C_sell):
         """
         """
         if move == "increase":
-            r = random.uniform(*self.increasing_rel_target)
-            a = random.uniform(*self.increasing_abs_target)
+            low, high = self.increasing_rel_target
+            r = low + (high - low) * self.model.next_uniform()
+            low, high = self.increasing_abs_target
+            a = low + (high - low) * self.model.next_uniform()
             return r * last_shout + a
 
-        r = random.uniform(*self.decreasing_rel_target)
-        a = random.uniform(*self.decreasing_abs_target)
+        low, high = self.decreasing_rel_target
+        r = low + (high - low) * self.model.next_uniform()
+        low, high = self.decreasing_abs_target
+        a = low + (high - low) * self.model.next_uniform()
         return  r * last_shout + a
 
     def widrow_holf_delta(self, target_price, offer):
@@ -345,7 +382,7 @@ class ZIP_sell(ZI_C_sell):
         a double auction
         """
 
-        side_last_offer = self.model.agent_last_offer.market_side.lower()
+        side_last_offer = self.model.agent_last_offer.side
 
         if step_over and not trade_made:
             for quantity in range(self.tot_commodities):
@@ -361,7 +398,7 @@ class ZIP_sell(ZI_C_sell):
                 self.adjust_profit_margin("increase", self.quantity, offer, self.model.transaction_price)
 
             # lower profit margin
-            elif side_last_offer == "buyer" and offer >= self.model.transaction_price and self.in_market:
+            elif side_last_offer == BUYER and offer >= self.model.transaction_price and self.in_market:
                 self.adjust_profit_margin("decrease", self.quantity, offer, self.model.transaction_price)
 
     def reset_agent(self):
@@ -377,6 +414,9 @@ class Kaplan_sell(ZI_sell):
     """
     market_side = "seller"
     strategy = "KAPLAN"
+    side = SELLER
+    code = KAPLAN
+    __slots__ = ("spread_ratio", "profit_perc", "time_frac", "most")
 
     def __init__(self, unique_id, model, prices, eq_surplus, params):
         super().__init__(unique_id, model, prices, eq_surplus)
@@ -413,7 +453,7 @@ class Kaplan_sell(ZI_sell):
         Adds random noise to parameter (max 50 percent)
         """
         half_param = param / 2
-        return param + random.uniform(-half_param, half_param)
+        return param + self.model.random.uniform(-half_param, half_param)
 
     def get_import_params(self):
         """
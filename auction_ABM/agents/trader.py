@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+from mesa import Agent
+
+# integer codes of the market sides and strategies
+BUYER, SELLER = 0, 1
+ZI, ZI_C, KAPLAN, ZIP = 0, 1, 2, 3
+STRATEGY_CODES = {"ZI": ZI, "ZI_C": ZI_C, "KAPLAN": KAPLAN, "ZIP": ZIP}
+STRATEGY_NAMES = {code: strategy for strategy, code in STRATEGY_CODES.items()}
+
+class Trader:
+    """
+    Lightweight base class of the traders instead of mesa.Agent. The
+    attributes of the traders are declared in __slots__, so an instance holds
+    no __dict__, and the market side and strategy of a trader class are also
+    given as integer codes (side and code), which are cheaper to compare
+    than the names (market_side and strategy).
+    """
+    __slots__ = ("unique_id", "model")
+    market_side = None
+    strategy = None
+    side = None
+    code = None
+
+    def __init__(self, unique_id, model):
+        self.unique_id = unique_id
+        self.model = model
+
+    @property
+    def random(self):
+        return self.model.random
+
+    def step(self):
+        pass
+
+    def advance(self):
+        pass
+
+class MesaAgent(Agent):
+    """
+    Thin adapter that presents a trader as a mesa.Agent, e.g. for Mesa's
+    DataCollector or visualization. Attributes are read from the trader.
+    """
+    def __init__(self, trader):
+        super().__init__(trader.unique_id, trader.model)
+        self.trader = trader
+
+    def __getattr__(self, name):
+        # only called for missing attributes, so during copy or unpickling
+        # (no trader yet) the lookup must not go through the trader again
+        if name == "trader" or (name.startswith("__") and name.endswith("__")):
+            raise AttributeError(name)
+        return getattr(self.trader, name)
+
+    def step(self):
+        self.trader.step()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import numpy as np
+
+from auction_ABM.agents.trader import BUYER
+
+class ZIPLearner:
+    """
+    Population-level learning rule of ZIP traders (Cliff D. & Bruten J., 1997)
+    for a single market side. The profit margins and momenta of all units of
+    all given agents are held in 2-D arrays (agents x units); the agents' own
+    profit_margins and momentum become views on their row, so the agents'
+    per-unit updates and the population-level updates stay in sync.
+    """
+    def __init__(self, agents, rng):
+        """
+        Initialize learner with:
+
+        agents: ZIP agents of the same market side (list)
+        rng: random generator to draw target prices (numpy.random.Generator)
+        """
+        self.agents = agents
+        self.rng = rng
+        self.is_buyer = agents[0].side == BUYER
+
+        self.prices = np.array([agent.prices for agent in agents], dtype=float)
+        self.profit_margins = np.array([agent.profit_margins for agent in agents], dtype=float)
+        self.momentum = np.array([agent.momentum for agent in agents], dtype=float)
+        self.learning_rate = np.array([[agent.learning_rate] for agent in agents])
+        self.momentum_coeff = np.array([[agent.momentum_coeff] for agent in agents])
+
+        # bounds of the target price when lowering the profit margin, buyers
+        # then increase their price and sellers decrease it
+        if self.is_buyer:
+            rel_targets = [agent.increasing_rel_target for agent in agents]
+            abs_targets = [agent.increasing_abs_target for agent in agents]
+        else:
+            rel_targets = [agent.decreasing_rel_target for agent in agents]
+            abs_targets = [agent.decreasing_abs_target for agent in agents]
+        self.rel_targets = np.array(rel_targets, dtype=float)
+        self.abs_targets = np.array(abs_targets, dtype=float)
+
+        for i, agent in enumerate(agents):
+            agent.profit_margins = self.profit_margins[i]
+            agent.momentum = self.momentum[i]
+
+    def margins_within_bounds(self):
+        """
+        Ensures that all profit margins are within bounds
+        """
+        if self.is_buyer:
+            np.clip(self.profit_margins, -1, 0, out=self.profit_margins)
+        else:
+            np.maximum(self.profit_margins, 0, out=self.profit_margins)
+
+    def lower_profit_margins(self, last_shout, time):
+        """
+        Lowers the profit margins of all units of all agents towards a target
+        price based on the last shout, by means of the Widrow-Hoff delta rule
+        with momentum (no momentum update in the first step of a period)
+        """
+        shape = self.profit_margins.shape
+        offer = self.prices * (1 + self.profit_margins)
+
+        r = self.rng.uniform(self.rel_targets[:, :1], self.rel_targets[:, 1:], size=shape)
+        a = self.rng.uniform(self.abs_targets[:, :1], self.abs_targets[:, 1:], size=shape)
+        target_price = r * last_shout + a
+
+        if time != 0:
+            delta = self.learning_rate * (target_price - offer)
+            self.momentum[:] = self.momentum_coeff * self.momentum + (1 - self.momentum_coeff) * delta
+
+        self.profit_margins[:] = (offer + self.momentum) / self.prices - 1
+        self.margins_within_bounds()
@@ -12,13 +12,19 @@ import math
 import logging
 from collections import defaultdict
 
-import pandas as pd
-from scipy.stats import spearmanr
 from mesa import Model
-from mesa.datacollection import DataCollector
 from tqdm import tqdm as pbar
 
-from auction_ABM.schedulers.schedules import RandomGS, ImitationScheduler
+from auction_ABM.agents.trader import BUYER, SELLER
+from auction_ABM.helpers.heaps import LazyHeap
+from auction_ABM.helpers.market_context import MarketContext
+from auction_ABM.helpers.evolution import StrategyCounter
+from auction_ABM.helpers.random_buffer import UniformBuffer
+from auction_ABM.helpers.recorder import ColumnRecorder
+from auction_ABM.helpers.seeds import replication_rngs
+from auction_ABM.helpers.spearman import RankCorrelation
+from auction_ABM.helpers.trace import EventTrace
+from auction_ABM.schedulers.schedules import RandomGS, ActiveSetGS, ImitationScheduler
 from auction_ABM.agents.buyers_GS import ZI_buy, ZI_C_buy, Kaplan_buy, ZIP_buy
 from auction_ABM.agents.sellers_GS import ZI_sell, ZI_C_sell, Kaplan_sell, ZIP_sell
 
@@ -97,13 +103,23 @@ class CDA(Model):
         log: boolean to indicate if important steps in simulation should be logged (bool)
         """
         super().__init__()
+
+        # random generators of this auction (and a buffer of uniform numbers for
+        # the shouts), derived from the master seed (if given) and the id such
+        # that every replication is reproducible
+        self.seed = parameters.get("seed")
+        self.random, self.rng = replication_rngs(self.seed, unique_id)
+        self.uniforms = UniformBuffer(self.rng)
+        self.next_uniform = self.uniforms.next
         
         # initialize given attributes
         self.unique_id = unique_id
         self.name = name
         self.market_id = market_id
-        self.prices_buy = prices_buy
-        self.prices_sell = prices_sell
+        # limit prices (possibly memory-mapped) as ints, which the agents
+        # handle faster than numpy scalars
+        self.prices_buy = [int(price) for price in prices_buy]
+        self.prices_sell = [int(price) for price in prices_sell]
         self.eq_price = equilibrium[0]
         self.eq_quantity = equilibrium[1]
         self.eq_surplus = equilibrium[2]
@@ -113,6 +129,8 @@ class CDA(Model):
         self.max_poss_price = parameters["max_price"]
         self.min_limit, self.max_limit = parameters["min_limit"], parameters["max_limit"]
         self.periods = parameters["periods"]
+        self.snapshot_interval = parameters.get("snapshot_interval", 0)
+        self.fast_forward = parameters.get("fast_forward", True)
         self.period = 0
         self.total_time = parameters["total_time"]
         self.time = 0
@@ -135,6 +153,9 @@ class CDA(Model):
             self.log_auction.setLevel(logging.INFO)
             self.log_auction.addHandler(filehandler)
 
+        # setup binary trace of all shouts if required
+        self.trace = EventTrace.for_run(name, unique_id, market_id) if parameters.get("trace") else None
+
         # monitoring variables for during a trading period
         self.transaction_price = None
         self.best_bid, self.best_bid_id = 0, None
@@ -142,8 +163,7 @@ class CDA(Model):
         self.max_trade, self.prev_max_trade = 0, math.inf
         self.min_trade, self.prev_min_trade = math.inf, -math.inf
         self.agent_last_offer, self.transaction_possible = None, False
-        self.transaction_buy = []
-        self.transaction_sell = []
+        self.transaction_ranks = RankCorrelation(incremental=parameters.get("incremental_spearman", False))
         self.no_transactions = 0
         self.surplus = defaultdict(float)
         self.quantity = defaultdict(float)
@@ -151,11 +171,21 @@ class CDA(Model):
         self.spearman_correlation = defaultdict(float)
         self.spearman_pvalue = defaultdict(float)
 
+        # market-level values shared by the traders in a time step
+        self.market_context = MarketContext(self)
+
         # set up scheduler for auction and initialize population
         self.init_population()
 
-        # intialize datacollector to keep track of data during the simulation
-        self.datacollector_transactions = DataCollector(
+        # lowest limit price of sellers and highest feasible price of buyers,
+        # kept up to date to determine the end of a period in constant time
+        self.sellers_limit, self.buyers_limit = LazyHeap(), LazyHeap()
+        self.init_limit_prices()
+
+        # intialize datacollector to keep track of data during the simulation, the
+        # agents are recorded at the end of a period (and every snapshot_interval
+        # transactions if given in the parameters)
+        self.datacollector_transactions = ColumnRecorder(
             model_reporters={
                 "ID": "unique_id",
                 "Period": "period",
@@ -171,10 +201,11 @@ class CDA(Model):
                 "Quantity": "quantity",
                 "Surplus": "surplus", 
                 "Budget": "budget"
-            }
+            },
+            snapshot_interval=self.snapshot_interval
         )
 
-        self.datacollector_periods = DataCollector(
+        self.datacollector_periods = ColumnRecorder(
             model_reporters={
                 "ID": "unique_id",
                 "Period": "period",
@@ -270,9 +301,7 @@ class CDA(Model):
         """
         Calculates the spearman rank correlation for the current period
         """
-        rank_buy = pd.Series(self.transaction_buy).rank(ascending=False)
-        rank_sell = pd.Series(self.transaction_sell).rank()
-        corr, p = spearmanr(rank_buy, rank_sell)
+        corr, p = self.transaction_ranks.correlation()
         self.spearman_correlation[self.period] = corr
         self.spearman_pvalue[self.period] = p
 
@@ -281,18 +310,20 @@ class CDA(Model):
         Resets outstanding bid and id
         """
         self.best_bid, self.best_bid_id = 0, None
+        self.market_context.invalidate()
 
     def reset_asks(self):
         """
         Resets outstanding ask and id
         """
         self.best_ask, self.best_ask_id = math.inf, None
+        self.market_context.invalidate()
 
     def is_trade_possible(self, agent):
         """
         Determines if trade is possible (best bid and ask crosses)
         """
-        if agent.market_side == "buyer":
+        if agent.side == BUYER:
             return agent.offer >= self.best_ask
 
         return agent.offer <= self.best_bid
@@ -305,6 +336,7 @@ class CDA(Model):
         seller_surplus = seller.transaction_update(self.transaction_price)
         self.surplus[self.period] += buyer_surplus + seller_surplus
         self.quantity[self.period] += 1
+        self.update_limit_price(buyer), self.update_limit_price(seller)
         self.schedule.update_no_transactions(buyer.unique_id, seller.unique_id)
 
         # update min trading price
@@ -326,19 +358,17 @@ class CDA(Model):
             self.log_auction.info("TRANSACTION POSSIBLE")
 
         # transaction price depends on the condition if last transaction was made by a buyer
-        if agent.market_side == "buyer":
+        if agent.side == BUYER:
             self.transaction_price = self.best_ask
             seller = self.schedule.get_agent(self.best_ask_id)
-            self.transaction_buy.append(agent.get_price())
-            self.transaction_sell.append(seller.get_price())
+            self.transaction_ranks.append(agent.get_price(), seller.get_price())
             self.manage_order_transaction(agent, seller)
             return seller
 
         
         self.transaction_price = self.best_bid
         buyer = self.schedule.get_agent(self.best_bid_id)
-        self.transaction_buy.append(buyer.get_price())
-        self.transaction_sell.append(agent.get_price())
+        self.transaction_ranks.append(buyer.get_price(), agent.get_price())
         self.manage_order_transaction(buyer, agent)
         
         return buyer
@@ -355,33 +385,67 @@ class CDA(Model):
             self.log_auction.info(self.get_info())
 
         # update outstanding price
-        if agent.market_side == "buyer":
+        if agent.side == BUYER:
             self.best_bid, self.best_bid_id = agent.offer, agent.unique_id
         else:
             self.best_ask, self.best_ask_id = agent.offer, agent.unique_id
+        self.market_context.invalidate()
 
         # update log
         if self.log:
             self.log_auction.info("AFTER UPDATE OUTSTANDING BIDS")
             self.log_auction.info(self.get_info())
 
+    def update_limit_price(self, agent):
+        """
+        Updates the limit price of a seller, or the highest price a buyer is
+        able to pay (limit price constrained by its budget)
+        """
+        if agent.side == SELLER:
+            self.sellers_limit.set(agent.unique_id, agent.get_price())
+        else:
+            self.buyers_limit.set(agent.unique_id, -min(agent.get_price(), agent.get_budget()))
+
+    def init_limit_prices(self):
+        """
+        Determines the limit prices of all agents at the start of a period
+        """
+        self.sellers_limit.clear(), self.buyers_limit.clear()
+        for agent in self.schedule.agent_buffer():
+            self.update_limit_price(agent)
+
     def is_end_auction(self):
         """
         Returns True if auction ended, False otherwise.
         """
 
         # lowest limit price of sellers still in market
-        min_sell = min([agent.get_price() for agent in self.schedule.agent_buffer() if agent.market_side == "seller"])
+        min_sell = self.sellers_limit.peek()
+        max_buy = self.buyers_limit.peek()
+        if min_sell is None or max_buy is None:
+            return True
 
-        # tries to find buyer able to make trade with seller with lowers limit price
-        for agent in self.schedule.agent_buffer():
-            if agent.market_side == "buyer":
-                price, budget = agent.get_price(), agent.get_budget()
-                if price >= min_sell and budget >= min_sell:
-                    return False
+        # auction has ended if no buyer is able to trade with seller with lowest limit price
+        return -max_buy[0] < min_sell[0]
+
+    def skip_idle_steps(self):
+        """
+        Fast-forwards through the steps in which the market is frozen: no agent
+        could shout in the last step and nothing changes until an agent 
+        becomes active due to the time passing (e.g. Kaplan traders timing 
+        out) or the period ends. The skipped steps are counted as steps
+        without transactions. Not done while logging every step.
+        """
+        if self.log:
+            return
 
-        # if not found auction has ended
-        return True
+        # the traders read the current step from the market context
+        self.market_context.update()
+        steps = min(self.schedule.idle_steps(), self.total_time - self.time)
+        if steps > 0:
+            self.time += steps
+            self.no_transactions += steps
+            self.schedule.skip_steps(steps)
 
     def reset_period(self):
         """
@@ -392,11 +456,13 @@ class CDA(Model):
         self.best_ask, self.best_ask_id = math.inf, None
         self.prev_min_trade, self.prev_max_trade = self.min_trade, self.max_trade
         self.min_trade, self.max_trade = math.inf, 0
-        self.transaction_buy, self.transaction_sell = [], []
+        self.transaction_ranks.clear()
         self.agent_last_offer, self.transaction_possible = None, False
         self.no_transactions = 0
+        self.market_context.invalidate()
         
         self.schedule.reset_agents()
+        self.init_limit_prices()
 
     def step(self):
         """
@@ -406,7 +472,8 @@ class CDA(Model):
         # run auction for given amount of periods, each having the same total time
         descr = "period bar auction {} with ID {} and market {}".format(self.name, self.unique_id, self.market_id)
         for self.period in pbar(range(self.periods), desc=descr):
-            for self.time in range(self.total_time):
+            self.time = 0
+            while self.time < self.total_time:
                 
                 # update log
                 if self.log:
@@ -433,12 +500,19 @@ class CDA(Model):
                 if self.is_end_auction():
                     break
 
+                self.time += 1
+                if self.fast_forward and self.schedule.idle:
+                    self.skip_idle_steps()
+            else:
+                # period ran out of time, last step
+                self.time = self.total_time - 1
+
             # reset auction for next period
             self.schedule.set_profit_dispersion()
             self.set_spearman_rank()
             self.efficiency[self.period] = allocative_efficiency(self)
-            self.datacollector_transactions.collect(self)
-            self.datacollector_periods.collect(self)
+            self.datacollector_transactions.collect(self, snapshot=True)
+            self.datacollector_periods.collect(self, snapshot=True)
             self.reset_period()
 
             # update log with final results period
@@ -453,6 +527,8 @@ class CDA(Model):
                 )
 
         self.running = False
+        if self.trace is not None:
+            self.trace.close()
 
         # update datacollectors with end of period information
         data_transactions = self.datacollector_transactions.get_model_vars_dataframe()
@@ -462,6 +538,30 @@ class CDA(Model):
 
         return data_transactions, data_periods, data_agents, data_periods_agents
 
+class ActiveSetCDA(CDA):
+    """
+    Continuous Double Auction model as represented in Gode en Sunder (1993),
+    with a scheduler that keeps track of the active agents instead of 
+    checking all agents every step (see ActiveSetGS).
+    """
+
+    def init_population(self):
+        """
+        Initialize population of traders
+        """
+        self.schedule = ActiveSetGS(self)
+        self.running = True
+        
+        for strategy, buyers in self.buyers_strats.items():
+            for i in range(buyers):
+                agent = self.create_buyer(strategy, self.prices_buy[i], self.params_strats[strategy])
+                self.schedule.add(agent)
+
+        for strategy, sellers in self.sellers_strats.items():
+            for i in range(sellers):
+                agent = self.create_seller(strategy, self.prices_sell[i], self.params_strats[strategy])
+                self.schedule.add(agent)
+
 class ReplicationByImitation(CDA):
     def __init__(
             self, unique_id, name, market_id, prices_buy, prices_sell, equilibrium, parameters, 
@@ -475,12 +575,8 @@ class ReplicationByImitation(CDA):
             total_sellers_strategies, save_output, log
         )
 
-        # additional attributes for evolutionary development
-        self.evo_process = []
-        self.periods_no_switches = 0
-
         # different datacollector for end-of-period data (for evolutionary process)
-        self.datacollector_periods = DataCollector(
+        self.datacollector_periods = ColumnRecorder(
             model_reporters={
                 "ID": "unique_id",
                 "Period": "period",
@@ -518,25 +614,21 @@ class ReplicationByImitation(CDA):
                 agent = self.create_seller(strategy, self.prices_sell[i], self.params_strats[strategy])
                 self.schedule.add(agent)
 
+        # amount of traders per strategy, updated by the scheduler on each switch
+        self.strategy_counter = StrategyCounter(self.schedule.agents, self.periods)
+
     def update_number_strategies(self):
         """
-        Determines the amount of traders per strategy for current period
+        Records the amount of traders per strategy for current period
         """
-        info = {"ID":  self.unique_id, "Period": self.period}
-        for agent in self.schedule.agent_buffer():
-            if agent.strategy in info:
-                info[agent.strategy] += 1
-            else:
-                info[agent.strategy] = 1
-
-        self.evo_process.append(info)
+        self.strategy_counter.record(self.period)
 
     def pop_has_converged(self):
         """
         Determines if the popolution has converged towards an equilibrium of
         strategies (not necesarily a Nash equilibrium)
         """
-        return self.periods_no_switches > 15
+        return self.strategy_counter.periods_no_switches > 15
 
     def step(self):
         """
@@ -546,7 +638,8 @@ class ReplicationByImitation(CDA):
         # run auction for given amount of periods, each having the same total time
         descr = "period bar auction {} with ID {} and market {}".format(self.name, self.unique_id, self.market_id)
         for self.period in pbar(range(self.periods), desc=descr):
-            for self.time in range(self.total_time):
+            self.time = 0
+            while self.time < self.total_time:
                 
                 # update log
                 if self.log:
@@ -573,12 +666,19 @@ class ReplicationByImitation(CDA):
                 if self.is_end_auction():
                     break
 
+                self.time += 1
+                if self.fast_forward and self.schedule.idle:
+                    self.skip_idle_steps()
+            else:
+                # period ran out of time, last step
+                self.time = self.total_time - 1
+
             # reset auction for next period
             self.schedule.set_profit_dispersion()
             self.set_spearman_rank()
             self.efficiency[self.period] = allocative_efficiency(self)
-            self.datacollector_transactions.collect(self)
-            self.datacollector_periods.collect(self)
+            self.datacollector_transactions.collect(self, snapshot=True)
+            self.datacollector_periods.collect(self, snapshot=True)
             self.update_number_strategies()
             self.reset_period()
 
@@ -598,12 +698,14 @@ class ReplicationByImitation(CDA):
                 break
 
         self.running = False
+        if self.trace is not None:
+            self.trace.close()
 
         # update datacollectors with end of period information
         data_transactions = self.datacollector_transactions.get_model_vars_dataframe()
         data_periods = self.datacollector_periods.get_model_vars_dataframe()
         data_agents = self.datacollector_transactions.get_agent_vars_dataframe()
         data_periods_agents = self.datacollector_periods.get_agent_vars_dataframe()
-        data_evo = pd.DataFrame(self.evo_process)
+        data_evo = self.strategy_counter.get_dataframe(self.unique_id)
 
         return data_transactions, data_periods, data_agents, data_periods_agents, data_evo
\ No newline at end of file
@@ -0,0 +1,779 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import os
+import math
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from mesa import Model
+from tqdm import tqdm as pbar
+
+import auction_ABM.auctions.cda_GS as GS
+from auction_ABM.helpers.random_buffer import UniformBuffer
+from auction_ABM.helpers.recorder import ColumnRecorder
+from auction_ABM.helpers.seeds import replication_rngs
+from auction_ABM.helpers.spearman import RankCorrelation
+from auction_ABM.helpers.trace import EventTrace
+from auction_ABM.agents.trader import BUYER, SELLER, ZI, ZI_C, KAPLAN, ZIP, STRATEGY_CODES, STRATEGY_NAMES
+
+# amount of shards of the sharded cda, independent of the amount of threads
+SHARDS = 16
+
+class Traders:
+    """
+    Array representation of all traders in a Gode & Sunder market. Each
+    attribute holds the value for every trader, buyers first and then sellers
+    (same order as the agents are created in cda_GS.CDA).
+    """
+    def __init__(self, buyers, sellers, eq_buyer_surplus, eq_seller_surplus, params_strategies, rng):
+        """
+        Initialize arrays with:
+
+        buyers: strategy, valuation and commodities of each buyer (list of tuples)
+        sellers: strategy, valuation and commodities of each seller (list of tuples)
+        eq_buyer_surplus: equilibrium surplus of a single buyer (float)
+        eq_seller_surplus: equilibrium surplus of a single seller (float)
+        params_strategies: agent specific parameters (nested dictionary {strategy:, {param: value}})
+        rng: random generator to draw the ZIP parameters (numpy.random.Generator)
+        """
+        traders = buyers + sellers
+        self.n = len(traders)
+        self.n_buyers = len(buyers)
+        self.unique_id = np.arange(1, self.n + 1)
+        self.buyer = np.zeros(self.n, dtype=bool)
+        self.buyer[:self.n_buyers] = True
+        self.strategy = np.array([STRATEGY_CODES[s.upper()] for s, _, _ in traders], dtype=np.int8)
+        self.valuation = np.array([v for _, v, _ in traders], dtype=float)
+        self.commodities = np.array([c for _, _, c in traders], dtype=np.int64)
+        self.eq_surplus = np.where(self.buyer, eq_buyer_surplus, eq_seller_surplus).astype(float)
+
+        # state of traders during a period
+        self.quantity = np.zeros(self.n, dtype=np.int64)
+        self.prev_quantity = np.zeros(self.n, dtype=np.int64)
+        self.budget = np.where(self.buyer, self.valuation * self.commodities, 0.0)
+        self.surplus = np.zeros(self.n)
+        self.prev_surplus = np.zeros(self.n)
+        self.profit_dispersion = np.zeros(self.n)
+        self.offer = np.where(self.buyer, 0.0, math.inf)
+        self.last_trade = np.zeros(self.n, dtype=np.int64)
+
+        # index arrays of each strategy per market side
+        self.groups = {}
+        for code in STRATEGY_NAMES:
+            self.groups[code, True] = np.flatnonzero(self.buyer & (self.strategy == code))
+            self.groups[code, False] = np.flatnonzero(~self.buyer & (self.strategy == code))
+
+        # strategy specific parameters, only meaningful for traders of that strategy
+        self.spread_ratio = np.zeros(self.n)
+        self.profit_perc = np.zeros(self.n)
+        self.time_frac = np.zeros(self.n)
+        self.profit_margin = np.zeros(self.n)
+        self.learning_rate = np.zeros(self.n)
+        self.momentum_coeff = np.zeros(self.n)
+        self.momentum = np.zeros(self.n)
+        self.zip_targets = {}
+
+        for buyer in (True, False):
+            kaplan = self.groups[KAPLAN, buyer]
+            if len(kaplan):
+                params = params_strategies["KAPLAN"]
+                self.spread_ratio[kaplan] = params["spread_ratio"]
+                self.profit_perc[kaplan] = params["profit_perc"]
+                self.time_frac[kaplan] = params["time_frac"]
+
+            zip_traders = self.groups[ZIP, buyer]
+            if len(zip_traders):
+                params = params_strategies["ZIP"]
+                margin = params["profit_margin_buyers"] if buyer else params["profit_margin_sellers"]
+                self.profit_margin[zip_traders] = rng.uniform(*margin, size=len(zip_traders))
+                self.learning_rate[zip_traders] = rng.uniform(*params["learning_rate"], size=len(zip_traders))
+                self.momentum_coeff[zip_traders] = rng.uniform(*params["momentum_coeff"], size=len(zip_traders))
+                self.zip_targets = {
+                    "decreasing_rel_target": params["decreasing_rel_target"],
+                    "increasing_rel_target": params["increasing_rel_target"],
+                    "decreasing_abs_target": params["decreasing_abs_target"],
+                    "increasing_abs_target": params["increasing_abs_target"]
+                }
+
+    def in_market(self):
+        """
+        Returns mask of traders that still have commodities left
+        """
+        return self.quantity < self.commodities
+
+    def reset_offers(self):
+        """
+        Reset offers of all traders to their initial value
+        """
+        self.offer[:self.n_buyers] = 0
+        self.offer[self.n_buyers:] = math.inf
+
+    def reset(self):
+        """
+        Resets all traders' attributes to their initial values for a new period
+        """
+        self.prev_quantity[:] = self.quantity
+        self.quantity[:] = 0
+        self.budget[:] = np.where(self.buyer, self.valuation * self.commodities, 0.0)
+        self.prev_surplus[:] = self.surplus
+        self.surplus[:] = 0
+        self.last_trade[:] = 0
+        self.momentum[:] = 0
+        self.reset_offers()
+
+class CDA(Model):
+    """
+    Continuous Double Auction model as represented in Gode en Sunder (1993),
+    with the state of all traders stored in arrays (see Traders) instead of
+    in Mesa agents. The activity of all traders is determined in a single
+    vectorized pass per time step. It returns the same data as cda_GS.CDA.
+    """
+    def __init__(
+            self, unique_id, name, market_id, prices_buy, prices_sell, equilibrium, parameters,
+            params_strategies={"ZI_C": {}}, total_buyers_strategies={"ZI_C": 10},
+            total_sellers_strategies={"ZI_C": 10}, save_output=False, log=True
+        ):
+        """
+        Initialize each model with:
+
+        unique_id: id of the model
+        name: name of the auction (str)
+        market_id: id of the market (int)
+        prices_buy: limit prices buyers (list)
+        prices_sell: limit prices sellers (list)
+        equilibrium: equilibrium price, quanitity and surplus (tuple)
+        parameters: paramaters such as min/max price, limit price, total periods
+                    and total time in period for auction (dict {param: value, param2, value2})
+        params_strategies: agent specific parameters (nested dictionary {strategy:, {param: value}})
+        total_buyers_strategies: distrbution agents on buyers' side (dict {strategy: total})
+        total_sellers_strategies: distrbution agents on sellers' side (dict {strategy: total})
+        save_output: boolean to indicate if data of transactions should be saved (bool)
+        log: boolean to indicate if important steps in simulation should be logged (bool)
+        """
+        super().__init__()
+
+        # random generators of this auction (and a buffer of uniform numbers for
+        # the shouts), derived from the master seed (if given) and the id such
+        # that every replication is reproducible
+        self.seed = parameters.get("seed")
+        self.random, self.rng = replication_rngs(self.seed, unique_id)
+        self.uniforms = UniformBuffer(self.rng)
+        self.next_uniform = self.uniforms.next
+
+        # initialize given attributes
+        self.unique_id = unique_id
+        self.name = name
+        self.market_id = market_id
+        self.prices_buy = prices_buy
+        self.prices_sell = prices_sell
+        self.eq_price = equilibrium[0]
+        self.eq_quantity = equilibrium[1]
+        self.eq_surplus = equilibrium[2]
+        self.eq_buyer_surplus = equilibrium[3]
+        self.eq_seller_surplus = equilibrium[4]
+        self.min_poss_price = parameters["min_price"]
+        self.max_poss_price = parameters["max_price"]
+        self.min_limit, self.max_limit = parameters["min_limit"], parameters["max_limit"]
+        self.periods = parameters["periods"]
+        self.snapshot_interval = parameters.get("snapshot_interval", 0)
+        self.shards = parameters.get("shards", SHARDS)
+        self.workers = parameters.get("workers") or os.cpu_count()
+        self.period = 0
+        self.total_time = parameters["total_time"]
+        self.time = 0
+        self.steps = 0
+        self.params_strats = params_strategies
+        self.all_strategies = set(params_strategies.keys())
+        self.buyers_strats = total_buyers_strategies
+        self.sellers_strats = total_sellers_strategies
+        self.save_output = save_output
+        self.log = log
+
+        # setup log file if required
+        if log:
+            log_folder = os.path.join("results", "log", name)
+            os.makedirs(log_folder, exist_ok=True)
+            log_auction_name = "auction_{}_ID_{}_market_{}".format(name, unique_id, market_id)
+            rel_path = os.path.join(log_folder, log_auction_name)
+            self.log_auction = logging.getLogger(log_auction_name)
+            filehandler = logging.FileHandler(rel_path + ".log", 'w')
+
+            self.log_auction.setLevel(logging.INFO)
+            self.log_auction.addHandler(filehandler)
+
+        # setup binary trace of all shouts if required
+        self.trace = EventTrace.for_run(name, unique_id, market_id) if parameters.get("trace") else None
+
+        # monitoring variables for during a trading period
+        self.transaction_price = None
+        self.best_bid, self.best_bid_id = 0, None
+        self.best_ask, self.best_ask_id = math.inf, None
+        self.max_trade, self.prev_max_trade = 0, math.inf
+        self.min_trade, self.prev_min_trade = math.inf, -math.inf
+        self.agent_last_offer, self.transaction_possible = None, False
+        self.last_offer = None
+        self.transaction_ranks = RankCorrelation(incremental=parameters.get("incremental_spearman", False))
+        self.no_transactions = 0
+        self.surplus = defaultdict(float)
+        self.quantity = defaultdict(float)
+        self.efficiency = defaultdict(float)
+        self.spearman_correlation = defaultdict(float)
+        self.spearman_pvalue = defaultdict(float)
+
+        # initialize population of traders
+        self.init_population()
+
+        # intialize datacollector to keep track of model data during the simulation,
+        # agent data is recorded from the trader arrays at the end of a period (and
+        # every snapshot_interval transactions if given in the parameters)
+        self.datacollector_transactions = ColumnRecorder(
+            model_reporters={
+                "ID": "unique_id",
+                "Period": "period",
+                "Surplus": GS.surplus_curr_period,
+                "Quantity": GS.quantity_curr_period,
+                "Price": "transaction_price",
+                "Squared error": GS.rmsd_transaction_price,
+                "Time": "time"
+            },
+            snapshot_interval=self.snapshot_interval
+        )
+        self.agent_records_transactions = []
+
+        self.datacollector_periods = ColumnRecorder(
+            model_reporters={
+                "ID": "unique_id",
+                "Period": "period",
+                "Efficiency": GS.allocative_efficiency,
+                "Trade ratio": GS.trade_ratio,
+                "Quantity": GS.quantity_curr_period,
+                "Spearman Correlation": GS.get_spearman_corr,
+                "Spearman P-value": GS.get_spearman_pvalue
+            }
+        )
+        self.agent_records_periods = []
+
+    def get_info(self):
+        """
+        Returns a string with basic information about the current state of the
+        auction.
+        """
+        return "Period: {}\nTime: {}\nBest Bid: {}\nBid ID: {}\n" \
+            "Best Ask: {}\nAsk ID: {}\nLast Price: {}\n" \
+            "Surplus: {}\nQuantity: {}\nMin Trade: {}\nMin Trade Prev: {}\n" \
+            "Max Trade: {}\nMax Trade Prev: {}\n" \
+            .format(
+                self.period, self.time, self.best_bid, self.best_bid_id,
+                self.best_ask, self.best_ask_id, self.transaction_price,
+                GS.surplus_curr_period(self), GS.quantity_curr_period(self),
+                self.min_trade, self.prev_min_trade, self.max_trade, self.prev_max_trade
+            )
+
+    def init_population(self):
+        """
+        Initialize arrays of the population of traders
+        """
+        self.running = True
+
+        buyers, sellers = [], []
+        for strategy, total in self.buyers_strats.items():
+            for i in range(total):
+                buyers.append((strategy, self.prices_buy[i], len(self.prices_buy)))
+
+        for strategy, total in self.sellers_strats.items():
+            for i in range(total):
+                sellers.append((strategy, self.prices_sell[i], len(self.prices_sell)))
+
+        self.traders = Traders(
+            buyers, sellers, self.eq_buyer_surplus, self.eq_seller_surplus, self.params_strats, self.rng
+        )
+        self.current_id = self.traders.n
+
+    def set_spearman_rank(self):
+        """
+        Calculates the spearman rank correlation for the current period
+        """
+        corr, p = self.transaction_ranks.correlation()
+        self.spearman_correlation[self.period] = corr
+        self.spearman_pvalue[self.period] = p
+
+    def reset_bids(self):
+        """
+        Resets outstanding bid and id
+        """
+        self.best_bid, self.best_bid_id = 0, None
+
+    def reset_asks(self):
+        """
+        Resets outstanding ask and id
+        """
+        self.best_ask, self.best_ask_id = math.inf, None
+
+    def kaplan_activity(self, idx, buyer, active):
+        """
+        Sets the activity of the Kaplan traders with the given indices
+        """
+        t = self.traders
+        best_bid, best_ask = self.best_bid, self.best_ask
+
+        # Kaplan only waits in the background once its side has an outstanding quote
+        if (buyer and best_bid == 0) or (not buyer and best_ask == math.inf):
+            active[idx] = True
+            return
+
+        valuation = t.valuation[idx]
+        time_out = 1 - self.time / self.total_time < t.time_frac[idx]
+        remaining_steps = self.total_time - self.time
+        no_transactions = self.steps - t.last_trade[idx]
+        truthteller = (self.no_transactions > 0.5 * remaining_steps) | (
+            (self.no_transactions > 5) & (no_transactions > 2 / 3 * remaining_steps)
+        )
+
+        with np.errstate(invalid="ignore"):
+            if buyer:
+                most = np.minimum(best_ask, valuation - 1)
+                can_shout = (most > best_bid) & (most <= t.budget[idx])
+                juicy_offer = best_ask < self.prev_min_trade
+                small_spread = (
+                    (best_ask < self.prev_max_trade)
+                    & (best_ask - best_bid < t.spread_ratio[idx] * best_ask)
+                    & (valuation - best_ask > (1 - t.profit_perc[idx]) * valuation)
+                )
+            else:
+                most = np.maximum(best_bid, valuation + 1)
+                can_shout = most < best_ask
+                juicy_offer = best_bid > self.prev_max_trade
+                small_spread = (
+                    (best_bid > self.prev_min_trade)
+                    & (best_ask - best_bid < t.spread_ratio[idx] * best_bid)
+                    & (best_bid - valuation > (1 + t.profit_perc[idx]) * valuation)
+                )
+
+        active[idx] = can_shout & (juicy_offer | small_spread | time_out | truthteller)
+
+    def get_active_mask(self, in_market):
+        """
+        Determines for all traders at once if they are active (can shout a price)
+        and still in the market
+        """
+        active = np.ones(self.traders.n, dtype=bool)
+        self.set_activity(self.traders.groups, active)
+
+        return active & in_market
+
+    def set_activity(self, groups, active):
+        """
+        Sets the activity of the traders in the given groups (dict with index
+        array per strategy and market side)
+        """
+        t = self.traders
+        best_bid, best_ask = self.best_bid, self.best_ask
+
+        idx = groups[ZI_C, True]
+        if len(idx):
+            active[idx] = (t.valuation[idx] > best_bid) & (best_bid < t.budget[idx])
+
+        idx = groups[ZI_C, False]
+        if len(idx):
+            active[idx] = t.valuation[idx] < best_ask
+
+        idx = groups[ZIP, True]
+        if len(idx):
+            valuation = t.valuation[idx]
+            offer = valuation * (1 + t.profit_margin[idx])
+            active[idx] = (valuation > best_bid) & (offer > best_bid) & (best_bid < t.budget[idx])
+
+        idx = groups[ZIP, False]
+        if len(idx):
+            valuation = t.valuation[idx]
+            offer = valuation * (1 + t.profit_margin[idx])
+            active[idx] = (valuation < best_ask) & (offer < best_ask)
+
+        for buyer in (True, False):
+            idx = groups[KAPLAN, buyer]
+            if len(idx):
+                self.kaplan_activity(idx, buyer, active)
+
+    def offer_price(self, i):
+        """
+        Returns the price shouted by the trader with index i
+        """
+        t = self.traders
+        strategy, valuation = t.strategy[i], t.valuation[i]
+
+        if t.buyer[i]:
+            if strategy == ZI:
+                low = self.best_bid + 0.01
+                return low + (self.max_poss_price - low) * self.next_uniform()
+            elif strategy == ZI_C:
+                max_bid = valuation if t.budget[i] > valuation else t.budget[i]
+                low = self.best_bid + 0.01
+                return low + (max_bid - low) * self.next_uniform()
+            elif strategy == ZIP:
+                return min(valuation * (1 + t.profit_margin[i]), t.budget[i])
+            elif self.best_bid != 0:
+                return min(self.best_ask, valuation - 1)
+            return self.min_poss_price
+
+        if strategy == ZI:
+            if self.best_ask == math.inf:
+                low = self.min_poss_price
+                return low + (self.max_poss_price - low) * self.next_uniform()
+            low = self.min_poss_price
+            return low + (self.best_ask - 0.01 - low) * self.next_uniform()
+        elif strategy == ZI_C:
+            if self.best_ask == math.inf:
+                return valuation + (self.max_poss_price - valuation) * self.next_uniform()
+            return valuation + (self.best_ask - 0.01 - valuation) * self.next_uniform()
+        elif strategy == ZIP:
+            return valuation * (1 + t.profit_margin[i])
+        elif self.best_ask != math.inf:
+            return max(self.best_bid, valuation + 1)
+        return self.max_poss_price
+
+    def make_trade(self, buyer, seller):
+        """
+        Make exchange between the buyer and seller with the given indices and
+        update the traders' and model parameters
+        """
+        t = self.traders
+        price = self.transaction_price
+        self.transaction_ranks.append(t.valuation[buyer], t.valuation[seller])
+
+        buyer_surplus = t.valuation[buyer] - price
+        seller_surplus = price - t.valuation[seller]
+        t.surplus[buyer] += buyer_surplus
+        t.surplus[seller] += seller_surplus
+        t.budget[buyer] -= price
+        t.budget[seller] += price
+        t.quantity[buyer] += 1
+        t.quantity[seller] += 1
+
+        # traders' steps without transaction are counted from the end of this step
+        t.last_trade[buyer] = t.last_trade[seller] = self.steps + 1
+
+        self.surplus[self.period] += buyer_surplus + seller_surplus
+        self.quantity[self.period] += 1
+
+        # update min and max trading price
+        if price < self.min_trade:
+            self.min_trade = price
+        if price > self.max_trade:
+            self.max_trade = price
+
+        if self.log:
+            self.log_auction.info(
+                "Buyer ID: {}, Seller ID: {}, Price {}\n" \
+                "Buyer surplus: {}, Seller surplus: {}, Surplus: {}, Quantity: {}\n" \
+                .format(
+                    t.unique_id[buyer], t.unique_id[seller], price, buyer_surplus,
+                    seller_surplus, self.surplus[self.period], self.quantity[self.period]
+                )
+            )
+
+    def adjust_profit_margins(self, idx, increase, last_shout, offer, rng):
+        """
+        Adjust profit margins of the ZIP traders with given indices towards a
+        target price based on the last shout (Widrow-Hoff with momentum), the
+        target prices are drawn from the given random generator
+        """
+        t = self.traders
+        targets = t.zip_targets
+        buyer = t.buyer[idx]
+
+        # buyers that raise their margin lower their target and vice versa
+        lower_target = buyer == increase
+        rel_low, rel_high = targets["decreasing_rel_target"], targets["increasing_rel_target"]
+        abs_low, abs_high = targets["decreasing_abs_target"], targets["increasing_abs_target"]
+        r = np.where(lower_target, rng.uniform(*rel_low, len(idx)), rng.uniform(*rel_high, len(idx)))
+        a = np.where(lower_target, rng.uniform(*abs_low, len(idx)), rng.uniform(*abs_high, len(idx)))
+        target_price = r * last_shout + a
+
+        if self.time != 0:
+            coeff = t.momentum_coeff[idx]
+            delta = t.learning_rate[idx] * (target_price - offer)
+            t.momentum[idx] = coeff * t.momentum[idx] + (1 - coeff) * delta
+
+        margin = (offer + t.momentum[idx]) / t.valuation[idx] - 1
+        t.profit_margin[idx] = np.where(buyer, np.clip(margin, -1, 0), np.maximum(margin, 0))
+
+    def update_params_traders(self, in_market):
+        """
+        Update the profit margins of all ZIP traders after a time step
+        """
+        if self.agent_last_offer is not None:
+            self.update_zip_traders(self.traders.groups, in_market, self.rng)
+
+    def update_zip_traders(self, groups, in_market, rng):
+        """
+        Update the profit margins of the ZIP traders in the given groups (dict
+        with index array per strategy and market side)
+        """
+        t = self.traders
+        side_last_offer = t.buyer[self.agent_last_offer]
+        for buyer in (True, False):
+            idx = groups[ZIP, buyer]
+            if not len(idx):
+                continue
+
+            offer = t.valuation[idx] * (1 + t.profit_margin[idx])
+            if buyer:
+                offer = np.minimum(offer, t.budget[idx])
+
+            # masks of traders that raise and lower their profit margin
+            if self.transaction_possible:
+                price = self.transaction_price
+                raise_margin = offer >= price if buyer else offer <= price
+                lower_margin = ~raise_margin & in_market[idx] & (side_last_offer != buyer)
+                lower_margin &= offer <= price if buyer else offer >= price
+                last_shout = price
+            else:
+                raise_margin = np.zeros(len(idx), dtype=bool)
+                last_shout = self.last_offer
+                lower_margin = in_market[idx] & (side_last_offer == buyer)
+                lower_margin &= offer <= last_shout if buyer else offer >= last_shout
+
+            if raise_margin.any():
+                self.adjust_profit_margins(idx[raise_margin], True, last_shout, offer[raise_margin], rng)
+            if lower_margin.any():
+                self.adjust_profit_margins(idx[lower_margin], False, last_shout, offer[lower_margin], rng)
+
+    def step_traders(self):
+        """
+        Performs a single time step: one randomly chosen active trader shouts
+        a price, after which a trade is made if possible.
+
+        The function returns True if a transaction has been made, otherwise False
+        """
+        t = self.traders
+        self.transaction_possible = False
+        in_market = t.in_market()
+        candidates = np.flatnonzero(self.get_active_mask(in_market))
+
+        if len(candidates):
+            i = candidates[self.random.randrange(len(candidates))]
+            offer = self.offer_price(i)
+            t.offer[i] = offer
+            self.agent_last_offer, self.last_offer = i, offer
+
+            # determines if trade needs to be made and update outstanding bid/ask
+            if t.buyer[i]:
+                trade_possible = offer >= self.best_ask
+                self.best_bid, self.best_bid_id = offer, i
+                if trade_possible:
+                    self.transaction_price = self.best_ask
+                    self.make_trade(i, self.best_ask_id)
+            else:
+                trade_possible = offer <= self.best_bid
+                self.best_ask, self.best_ask_id = offer, i
+                if trade_possible:
+                    self.transaction_price = self.best_bid
+                    self.make_trade(self.best_bid_id, i)
+
+            self.transaction_possible = trade_possible
+            if self.trace is not None:
+                self.trace.record(
+                    self.period, self.time, t.unique_id[i], BUYER if t.buyer[i] else SELLER,
+                    trade_possible, offer, self.best_bid, self.best_ask
+                )
+
+        self.update_params_traders(in_market)
+        self.steps += 1
+
+        return self.transaction_possible
+
+    def is_end_auction(self):
+        """
+        Returns True if auction ended, False otherwise.
+        """
+        t = self.traders
+        in_market = t.in_market()
+
+        # lowest limit price of sellers still in market
+        sellers = in_market & ~t.buyer
+        if not sellers.any():
+            return True
+        min_sell = t.valuation[sellers].min()
+
+        # tries to find buyer able to make trade with seller with lowers limit price
+        buyers = in_market & t.buyer
+        return not np.any(buyers & (t.valuation >= min_sell) & (t.budget >= min_sell))
+
+    def record_traders(self, records):
+        """
+        Records the state of all traders for the current step
+        """
+        t = self.traders
+        records.append((
+            self.steps, self.period, t.quantity.copy(), t.surplus.copy(),
+            t.profit_dispersion.copy(), t.budget.copy()
+        ))
+
+    def get_agent_vars_dataframe(self, records, columns):
+        """
+        Creates a dataframe of recorded trader data in the same format as
+        the recorders of the agent based models
+        """
+        t = self.traders
+        total = len(records)
+        steps = np.repeat(np.fromiter((r[0] for r in records), dtype=np.int64, count=total), t.n)
+        periods = np.repeat(np.fromiter((r[1] for r in records), dtype=np.int64, count=total), t.n)
+        states = [np.concatenate([r[j] for r in records]) if total else [] for j in range(2, 6)]
+        values = {
+            "Step": steps, "AgentID": np.tile(t.unique_id, total), "ID": np.full(total * t.n, self.unique_id),
+            "Period": periods, "Quantity": states[0], "Surplus": states[1], "Profit dispersion": states[2],
+            "Budget": states[3]
+        }
+
+        df = pd.DataFrame({column: values[column] for column in ["Step", "AgentID"] + columns})
+        return df.set_index(["Step", "AgentID"])
+
+    def reset_period(self):
+        """
+        Resets auction for new period to take place
+        """
+        self.transaction_price = None
+        self.best_bid, self.best_bid_id = 0, None
+        self.best_ask, self.best_ask_id = math.inf, None
+        self.prev_min_trade, self.prev_max_trade = self.min_trade, self.max_trade
+        self.min_trade, self.max_trade = math.inf, 0
+        self.transaction_ranks.clear()
+        self.agent_last_offer, self.transaction_possible = None, False
+        self.last_offer = None
+        self.no_transactions = 0
+        self.steps = 0
+
+        self.traders.reset()
+
+    def step(self):
+        """
+        Run auction.
+        """
+        # run auction for given amount of periods, each having the same total time
+        descr = "period bar auction {} with ID {} and market {}".format(self.name, self.unique_id, self.market_id)
+        for self.period in pbar(range(self.periods), desc=descr):
+            for self.time in range(self.total_time):
+
+                # update data if transaction is made during step
+                if self.step_traders():
+                    self.reset_asks(), self.reset_bids()
+                    self.traders.reset_offers()
+                    self.datacollector_transactions.collect(self)
+                    if self.datacollector_transactions.snapshot_due():
+                        self.record_traders(self.agent_records_transactions)
+                    self.no_transactions = 0
+                else:
+                    self.no_transactions += 1
+
+                # determines if all possible trades are already done, if so terminate period
+                if self.is_end_auction():
+                    break
+
+            # reset auction for next period
+            t = self.traders
+            t.profit_dispersion[:] = (t.surplus - t.eq_surplus) ** 2
+            self.set_spearman_rank()
+            self.efficiency[self.period] = GS.allocative_efficiency(self)
+            self.datacollector_transactions.collect(self)
+            self.record_traders(self.agent_records_transactions)
+            self.datacollector_periods.collect(self)
+            self.record_traders(self.agent_records_periods)
+            self.reset_period()
+
+            # update log with final results period
+            if self.log:
+                self.log_auction.info("Auction period {} ended in time step {}".format(self.period, self.time))
+                self.log_auction.info(
+                    "Efficiency {}, Surplus: {}, Quantity traded {}".format(
+                        self.surplus[self.period] / self.eq_surplus,
+                        self.surplus[self.period],
+                        self.quantity[self.period]
+                    )
+                )
+
+        self.running = False
+        if self.trace is not None:
+            self.trace.close()
+
+        # gather collected data in the same format as cda_GS.CDA
+        data_transactions = self.datacollector_transactions.get_model_vars_dataframe()
+        data_periods = self.datacollector_periods.get_model_vars_dataframe()
+        data_agents = self.get_agent_vars_dataframe(
+            self.agent_records_transactions, ["ID", "Period", "Quantity", "Surplus", "Budget"]
+        )
+        data_periods_agents = self.get_agent_vars_dataframe(
+            self.agent_records_periods, ["ID", "Period", "Quantity", "Surplus", "Profit dispersion", "Budget"]
+        )
+
+        return data_transactions, data_periods, data_agents, data_periods_agents
+
+class ShardedCDA(CDA):
+    """
+    Continuous Double Auction with the traders split into shards of which the
+    activity and the ZIP updates are determined in parallel by a pool of
+    threads (which share the trader arrays, NumPy releases the GIL during
+    the array operations). Each step still consists of a single shout and at
+    most one trade. Meant for very large markets, for which the array
+    operations per shard outweigh the cost of dispatching them.
+    """
+    def init_population(self):
+        """
+        Initialize population of traders and divide them into shards. The
+        amount of shards (default SHARDS) and not the amount of threads
+        (workers, default is the amount of cpus) fixes the division and the
+        random streams, so the results do not depend on the amount of threads.
+        """
+        super().init_population()
+
+        t = self.traders
+        bounds = np.linspace(0, t.n, self.shards + 1).astype(int)
+        self.shard_groups = [
+            {key: idx[(idx >= start) & (idx < end)] for key, idx in t.groups.items()}
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+        # every shard draws its ZIP target prices from its own stream
+        self.shard_rngs = [np.random.default_rng(seed) for seed in self.rng.integers(2**63, size=self.shards)]
+        self.executor = None
+
+    def get_active_mask(self, in_market):
+        """
+        Determines the activity of all traders, each shard in parallel
+        """
+        active = np.ones(self.traders.n, dtype=bool)
+        futures = [self.executor.submit(self.set_activity, groups, active) for groups in self.shard_groups]
+        for future in futures:
+            future.result()
+
+        return active & in_market
+
+    def update_params_traders(self, in_market):
+        """
+        Update the profit margins of all ZIP traders, each shard in parallel
+        """
+        if self.agent_last_offer is None:
+            return
+
+        futures = [
+            self.executor.submit(self.update_zip_traders, groups, in_market, rng)
+            for groups, rng in zip(self.shard_groups, self.shard_rngs)
+        ]
+        for future in futures:
+            future.result()
+
+    def step(self):
+        """
+        Run auction with a pool of threads that only lives during the run
+        """
+        with ThreadPoolExecutor(self.workers) as self.executor:
+            return super().step()
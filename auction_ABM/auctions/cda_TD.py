@@ -12,13 +12,18 @@ import math
 import logging
 from collections import defaultdict
 
-import pandas as pd
-from scipy.stats import spearmanr
 from mesa import Model
-from mesa.datacollection import DataCollector
 from tqdm import tqdm as pbar
 
 import auction_ABM.auctions.cda_GS as GS
+from auction_ABM.agents.trader import BUYER, SELLER
+from auction_ABM.helpers.heaps import LazyHeap
+from auction_ABM.helpers.evolution import StrategyCounter
+from auction_ABM.helpers.random_buffer import UniformBuffer
+from auction_ABM.helpers.recorder import ColumnRecorder
+from auction_ABM.helpers.seeds import replication_rngs
+from auction_ABM.helpers.spearman import RankCorrelation
+from auction_ABM.helpers.trace import EventTrace
 from auction_ABM.schedulers.schedules_TD import RandomTD, ImitationScheduler
 from auction_ABM.agents.buyers_TD import ZI_buy, ZI_C_buy, Kaplan_buy, ZIP_buy
 from auction_ABM.agents.sellers_TD import ZI_sell, ZI_C_sell, Kaplan_sell, ZIP_sell
@@ -51,13 +56,23 @@ class CDA(Model):
         log: boolean to indicate if important steps in simulation should be logged (bool)
         """
         super().__init__()
+
+        # random generators of this auction (and a buffer of uniform numbers for
+        # the shouts), derived from the master seed (if given) and the id such
+        # that every replication is reproducible
+        self.seed = parameters.get("seed")
+        self.random, self.rng = replication_rngs(self.seed, unique_id)
+        self.uniforms = UniformBuffer(self.rng)
+        self.next_uniform = self.uniforms.next
         
         # initialize given attributes
         self.unique_id = unique_id
         self.name = name
         self.market_id = market_id
-        self.prices_buy = prices_buy
-        self.prices_sell = prices_sell
+        # limit prices (possibly memory-mapped) as ints, which the agents
+        # handle faster than numpy scalars
+        self.prices_buy = [int(price) for price in prices_buy]
+        self.prices_sell = [int(price) for price in prices_sell]
         self.eq_price = equilibrium[0]
         self.eq_quantity = equilibrium[1]
         self.eq_surplus = equilibrium[2]
@@ -68,6 +83,7 @@ class CDA(Model):
         self.max_poss_price = parameters["max_price"]
         self.min_limit, self.max_limit = parameters["min_limit"], parameters["max_limit"]
         self.periods = parameters["periods"]
+        self.snapshot_interval = parameters.get("snapshot_interval", 0)
         self.period = 0
         self.total_time = parameters["total_time"]
         self.time = 0
@@ -90,9 +106,11 @@ class CDA(Model):
             self.log_auction.setLevel(logging.INFO)
             self.log_auction.addHandler(filehandler)
 
+        # setup binary trace of all shouts if required
+        self.trace = EventTrace.for_run(name, unique_id, market_id) if parameters.get("trace") else None
+
          # monitoring variables for during a trading period
         self.transaction_price = None
-        self.outstanding_bids, self.outstanding_asks = {}, {}
         self.best_bid, self.best_bid_id = 0, None
         self.best_ask, self.best_ask_id = math.inf, None
         self.max_trade, self.prev_max_trade = 0, math.inf
@@ -103,15 +121,21 @@ class CDA(Model):
         self.efficiency = defaultdict(float)
         self.spearman_correlation = defaultdict(float)
         self.spearman_pvalue = defaultdict(float)
-        self.transaction_buy = []
-        self.transaction_sell = []
+        self.transaction_ranks = RankCorrelation(incremental=parameters.get("incremental_spearman", False))
         self.no_transactions = 0
 
         # set up scheduler for auction and initialize population
         self.init_population()
 
-         # intialize datacollector to keep track of transaction data
-        self.datacollector_transactions = DataCollector(
+        # lowest limit price of sellers and highest feasible price of buyers,
+        # kept up to date to determine the end of a period in constant time
+        self.sellers_limit, self.buyers_limit = LazyHeap(), LazyHeap()
+        self.init_limit_prices()
+
+         # intialize datacollector to keep track of transaction data, the agents
+        # are recorded at the end of a period (and every snapshot_interval
+        # transactions if given in the parameters)
+        self.datacollector_transactions = ColumnRecorder(
             model_reporters={
                 "ID": "unique_id",
                 "Period": "period",
@@ -127,11 +151,12 @@ class CDA(Model):
                 "Quantity": "quantity",
                 "Surplus": "surplus", 
                 "Budget": "budget"
-            }
+            },
+            snapshot_interval=self.snapshot_interval
         )
 
         # datacollector for end-of-period statistics
-        self.datacollector_periods = DataCollector(
+        self.datacollector_periods = ColumnRecorder(
             model_reporters={
                 "ID": "unique_id",
                 "Period": "period",
@@ -227,9 +252,7 @@ class CDA(Model):
         """
         Calculates the spearman rank correlation for the current period
         """
-        rank_buy = pd.Series(self.transaction_buy).rank(ascending=False)
-        rank_sell = pd.Series(self.transaction_sell).rank()
-        corr, p = spearmanr(rank_buy, rank_sell)
+        corr, p = self.transaction_ranks.correlation()
         self.spearman_correlation[self.period] = corr
         self.spearman_pvalue[self.period] = p
 
@@ -237,7 +260,7 @@ class CDA(Model):
         """
         Determines if trade is possible (best bid and ask crosses)
         """
-        if agent.market_side == "buyer":
+        if agent.side == BUYER:
             return agent.offer >= self.best_ask
 
         return agent.offer <= self.best_bid
@@ -256,12 +279,10 @@ class CDA(Model):
             self.log_auction.info(self.get_info())
 
         # update outstanding price
-        if agent.market_side == "buyer" and agent.offer > self.best_bid:
+        if agent.side == BUYER and agent.offer > self.best_bid:
             self.best_bid, self.best_bid_id = agent.offer, agent.unique_id
-            self.outstanding_bids[agent.unique_id] = agent.offer
-        elif agent.market_side == "seller" and agent.offer < self.best_ask:
+        elif agent.side == SELLER and agent.offer < self.best_ask:
             self.best_ask, self.best_ask_id = agent.offer, agent.unique_id
-            self.outstanding_asks[agent.unique_id] = agent.offer
 
         # update log
         if self.log:
@@ -270,35 +291,18 @@ class CDA(Model):
 
     def sets_best_bid(self):
         """
-        Sets new best bid and the corresponding agent id
+        Sets new best bid and the corresponding agent id, after a trade the
+        bid is reset to empty
         """
-        if self.outstanding_bids:
-            self.best_bid_id = max(
-                self.outstanding_bids, key=lambda x: self.outstanding_bids[x]
-            )
-            self.best_bid = self.outstanding_bids[self.best_bid_id]
-
         self.best_bid, self.best_bid_id = 0, None
 
     def sets_best_ask(self):
         """
-        Sets new best ask and the corresponding agent id
+        Sets new best ask and the corresponding agent id, after a trade the
+        ask is reset to empty
         """
-        if self.outstanding_asks:
-            self.best_ask_id = min(
-                self.outstanding_asks, key=lambda x: self.outstanding_asks[x]
-            )
-            self.best_ask = self.outstanding_asks[self.best_ask_id]
-
         self.best_ask, self.best_ask_id = math.inf, None
 
-    def remove_outstanding_offers(self, buyer, seller):
-        """
-        Removes any outstanding offers from queue after the transaction
-        """
-        self.outstanding_bids.pop(buyer.unique_id, None)
-        self.outstanding_asks.pop(seller.unique_id, None)
-
     def manage_order_transaction(self, buyer, seller):
         """
         Updates the agents' and model paramaters for a transaction
@@ -307,8 +311,8 @@ class CDA(Model):
         seller_surplus = seller.transaction_update(self.transaction_price)
         self.surplus[self.period] += buyer_surplus + seller_surplus
         self.quantity[self.period] += 1
+        self.update_limit_price(buyer), self.update_limit_price(seller)
         buyer.reset_no_transactions(), seller.reset_no_transactions()
-        self.remove_outstanding_offers(buyer, seller)
         self.sets_best_bid(), self.sets_best_ask()
 
         # update min trading price
@@ -330,61 +334,68 @@ class CDA(Model):
             self.log_auction.info("TRANSACTION POSSIBLE")
 
         # transaction price depends on the condition if last transaction was made by a buyer
-        if agent.market_side == "buyer":
+        if agent.side == BUYER:
             self.transaction_price = self.best_ask
             seller = self.schedule.get_agent(self.best_ask_id)
-            self.transaction_buy.append(agent.get_price())
-            self.transaction_sell.append(seller.get_price())
+            self.transaction_ranks.append(agent.get_price(), seller.get_price())
             self.manage_order_transaction(agent, seller)
             return agent.unique_id, seller.unique_id
 
         
         self.transaction_price = self.best_bid
         buyer = self.schedule.get_agent(self.best_bid_id)
-        self.transaction_buy.append(buyer.get_price())
-        self.transaction_sell.append(agent.get_price())
+        self.transaction_ranks.append(buyer.get_price(), agent.get_price())
         self.manage_order_transaction(buyer, agent)
         
         return buyer.unique_id, agent.unique_id
 
+    def update_limit_price(self, agent):
+        """
+        Updates the limit price of a seller, or the highest price a buyer is
+        able to pay (limit price constrained by its budget)
+        """
+        if agent.side == SELLER:
+            self.sellers_limit.set(agent.unique_id, agent.get_price())
+        else:
+            self.buyers_limit.set(agent.unique_id, -min(agent.get_price(), agent.get_budget()))
+
+    def init_limit_prices(self):
+        """
+        Determines the limit prices of all agents at the start of a period
+        """
+        self.sellers_limit.clear(), self.buyers_limit.clear()
+        for agent in self.schedule.agent_buffer():
+            self.update_limit_price(agent)
+
     def is_end_auction(self):
         """
         Returns True if auction ended, False otherwise.
         """
 
         # lowest limit price of sellers still in market
-        min_sell = min(
-            [
-                agent.get_price() for agent in self.schedule.agent_buffer() 
-                if agent.market_side == "seller"
-            ]
-        )
+        min_sell = self.sellers_limit.peek()
+        max_buy = self.buyers_limit.peek()
+        if min_sell is None or max_buy is None:
+            return True
 
-        # tries to find buyer able to make trade with seller with lowers limit price
-        for agent in self.schedule.agent_buffer():
-            if agent.market_side == "buyer":
-                price, budget = agent.get_price(), agent.get_budget()
-                if price >= min_sell and budget >= min_sell:
-                    return False
-
-        # if not found auction has ended
-        return True
+        # auction has ended if no buyer is able to trade with seller with lowest limit price
+        return -max_buy[0] < min_sell[0]
 
     def reset_period(self):
         """
         Resets auction for new period to take place
         """
         self.transaction_price = None
-        self.outstanding_bids, self.outstanding_asks = {}, {}
         self.best_bid, self.best_bid_id = 0, None
         self.best_ask, self.best_ask_id = math.inf, None
         self.prev_min_trade, self.prev_max_trade = self.min_trade, self.max_trade
         self.min_trade, self.max_trade = math.inf, 0
-        self.transaction_buy, self.transaction_sell = [], []
+        self.transaction_ranks.clear()
         self.agent_last_offer, self.transaction_possible = None, False
         self.no_transactions = 0
         
         self.schedule.reset_agents()
+        self.init_limit_prices()
 
     def step(self):
         """
@@ -420,8 +431,8 @@ class CDA(Model):
             self.schedule.set_profit_dispersion()
             self.set_spearman_rank()
             self.efficiency[self.period] = GS.allocative_efficiency(self)
-            self.datacollector_transactions.collect(self)
-            self.datacollector_periods.collect(self)
+            self.datacollector_transactions.collect(self, snapshot=True)
+            self.datacollector_periods.collect(self, snapshot=True)
             self.reset_period()
 
             # update log with final results period
@@ -436,6 +447,8 @@ class CDA(Model):
                 )
 
         self.running = False
+        if self.trace is not None:
+            self.trace.close()
 
         # update datacollectors with end of period information
         data_transactions = self.datacollector_transactions.get_model_vars_dataframe()
@@ -458,12 +471,8 @@ class ReplicationByImitation(CDA):
             total_sellers_strategies, save_output, log
         )
 
-        # additional attributes for evolutionary development
-        self.evo_process = []
-        self.periods_no_switches = 0
-
         # different datacollector for end-of-period data (for evolutionary process)
-        self.datacollector_periods = DataCollector(
+        self.datacollector_periods = ColumnRecorder(
             model_reporters={
                 "ID": "unique_id",
                 "Period": "period",
@@ -501,25 +510,21 @@ class ReplicationByImitation(CDA):
                 agent = self.create_seller(strategy, self.params_strats[strategy])
                 self.schedule.add(agent)
 
+        # amount of traders per strategy, updated by the scheduler on each switch
+        self.strategy_counter = StrategyCounter(self.schedule.agents, self.periods)
+
     def update_number_strategies(self):
         """
-        Determines the amount of traders per strategy for current period
+        Records the amount of traders per strategy for current period
         """
-        info = {"ID":  self.unique_id, "Period": self.period}
-        for agent in self.schedule.agent_buffer():
-            if agent.strategy in info:
-                info[agent.strategy] += 1
-            else:
-                info[agent.strategy] = 1
-
-        self.evo_process.append(info)
+        self.strategy_counter.record(self.period)
 
     def pop_has_converged(self):
         """
         Determines if the popolution has converged towards an equilibrium of
         strategies (not necesarily a Nash equilibrium)
         """
-        return self.periods_no_switches > 15
+        return self.strategy_counter.periods_no_switches > 15
 
     def step(self):
         """
@@ -555,8 +560,8 @@ class ReplicationByImitation(CDA):
             self.schedule.set_profit_dispersion()
             self.set_spearman_rank()
             self.efficiency[self.period] = GS.allocative_efficiency(self)
-            self.datacollector_transactions.collect(self)
-            self.datacollector_periods.collect(self)
+            self.datacollector_transactions.collect(self, snapshot=True)
+            self.datacollector_periods.collect(self, snapshot=True)
             self.update_number_strategies()
             self.reset_period()
 
@@ -577,12 +582,14 @@ class ReplicationByImitation(CDA):
                 break
 
         self.running = False
+        if self.trace is not None:
+            self.trace.close()
 
         # update datacollectors with end of period information
         data_transactions = self.datacollector_transactions.get_model_vars_dataframe()
         data_periods = self.datacollector_periods.get_model_vars_dataframe()
         data_agents = self.datacollector_transactions.get_agent_vars_dataframe()
         data_periods_agents = self.datacollector_periods.get_agent_vars_dataframe()
-        data_evo = pd.DataFrame(self.evo_process)
+        data_evo = self.strategy_counter.get_dataframe(self.unique_id)
 
         return data_transactions, data_periods, data_agents, data_periods_agents, data_evo
\ No newline at end of file
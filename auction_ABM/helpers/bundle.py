@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+
+import numpy as np
+
+from auction_ABM.helpers.data import load_demand_supply, load_parameters
+
+MAGIC = b"CDABNDL1"
+BUNDLE_FILE = "market.bundle"
+PRICES_DTYPE = np.dtype("<i8")
+ALIGNMENT = 64
+
+def map_array(path, offset, length):
+    """
+    Maps an array of limit prices of a bundle read-only into memory
+    """
+    return MappedArray(path, dtype=PRICES_DTYPE, mode="r", offset=offset, shape=(length,))
+
+class MappedArray(np.memmap):
+    """
+    Read-only memory-mapped array of limit prices. When pickled (e.g. to send
+    it to a pool worker) only the location in the bundle is sent, the worker
+    maps the array again instead of receiving a copy of the prices.
+    """
+    def __reduce__(self):
+        # only an array mapped directly onto the file can be mapped again,
+        # views (e.g. slices) are pickled as regular arrays
+        if not isinstance(self.base, mmap.mmap):
+            return np.asarray(self).__reduce__()
+
+        return map_array, (self.filename, self.offset, len(self))
+
+def source_files(market_name, market_id, name):
+    """
+    Returns the text files a market bundle is compiled from
+    """
+    ds_folder = "{}_market_{}".format(market_name, market_id)
+    folder = os.path.join(ds_folder, name)
+    return [
+        os.path.join(ds_folder, "market.txt"),
+        os.path.join(ds_folder, "equilibrium_market.txt"),
+        os.path.join(folder, "distribution_agents.txt"),
+        os.path.join(folder, "parameters_agents.txt"),
+        os.path.join(folder, "parameters_CDA.txt")
+    ]
+
+def content_hash(files):
+    """
+    Returns the sha256 hash of the contents of the given files
+    """
+    sha = hashlib.sha256(MAGIC)
+    for file in files:
+        with open(file, "rb") as f:
+            content = f.read()
+        sha.update(os.path.basename(file).encode())
+        sha.update(len(content).to_bytes(8, "little"))
+        sha.update(content)
+
+    return sha.hexdigest()
+
+def read_header(path):
+    """
+    Returns the header of a bundle (dict), None if the file is not a bundle
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        size = int.from_bytes(f.read(8), "little")
+        return json.loads(f.read(size).decode())
+
+def compile_bundle(market_name, market_id, name, path=None):
+    """
+    Parses the text files of a market and its parameters and writes them to
+    a single binary bundle: a header with the content hash, the equilibrium
+    and the parameters (json) followed by the limit prices as aligned 64-bit
+    integer arrays. Returns the path of the bundle.
+    """
+    if path is None:
+        path = os.path.join("{}_market_{}".format(market_name, market_id), name, BUNDLE_FILE)
+
+    prices_buy, prices_sell, eq = load_demand_supply(market_name, market_id)
+    params_strats, total_buyers_strats, total_sellers_strats, params_model = load_parameters(
+        market_name, market_id, name
+    )
+    arrays = {
+        "prices_buy": np.asarray(prices_buy, dtype=PRICES_DTYPE),
+        "prices_sell": np.asarray(prices_sell, dtype=PRICES_DTYPE)
+    }
+    header = {
+        "hash": content_hash(source_files(market_name, market_id, name)),
+        "equilibrium": eq,
+        "params_strategies": params_strats,
+        "total_buyers_strategies": total_buyers_strats,
+        "total_sellers_strategies": total_sellers_strats,
+        "params_model": params_model,
+        "arrays": {}
+    }
+
+    # the offsets of the arrays depend on the size of the header, so the
+    # header is encoded until the offsets stop changing
+    offsets = dict.fromkeys(arrays, 0)
+    while True:
+        header["arrays"] = {
+            key: {"offset": offsets[key], "length": len(array)} for key, array in arrays.items()
+        }
+        encoded = json.dumps(header).encode()
+        position = len(MAGIC) + 8 + len(encoded)
+        new_offsets = {}
+        for key, array in arrays.items():
+            position += -position % ALIGNMENT
+            new_offsets[key] = position
+            position += array.nbytes
+        if new_offsets == offsets:
+            break
+        offsets = new_offsets
+
+    # write to a temporary file of its own first (next to the bundle, such 
+    # that it can be renamed) so a bundle is never half written, also not when
+    # several processes compile the same bundle
+    fd, tmp_path = tempfile.mkstemp(prefix=BUNDLE_FILE, suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(encoded).to_bytes(8, "little"))
+            f.write(encoded)
+            for key, array in arrays.items():
+                f.write(bytes(offsets[key] - f.tell()))
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return path
+
+def load_bundle(path):
+    """
+    Loads a bundle, the limit prices are mapped read-only into memory.
+    Returns the same data as load_demand_supply and load_parameters.
+    """
+    header = read_header(path)
+    if header is None:
+        raise ValueError("Not a market bundle: {}".format(path))
+
+    prices = {
+        key: map_array(path, array["offset"], array["length"])
+        for key, array in header["arrays"].items()
+    }
+
+    # json stores tuples as lists
+    params_strats = {
+        strategy: {param: tuple(value) if isinstance(value, list) else value for param, value in params.items()}
+        for strategy, params in header["params_strategies"].items()
+    }
+
+    return (
+        prices["prices_buy"], prices["prices_sell"], header["equilibrium"], params_strats,
+        header["total_buyers_strategies"], header["total_sellers_strategies"], header["params_model"]
+    )
+
+def load_market(market_name, market_id, name):
+    """
+    Loads market and parameters from the compiled bundle, the bundle is
+    (re)compiled when it is missing or the text files have changed
+    """
+    path = os.path.join("{}_market_{}".format(market_name, market_id), name, BUNDLE_FILE)
+    current_hash = content_hash(source_files(market_name, market_id, name))
+
+    header = read_header(path) if os.path.isfile(path) else None
+    if header is None or header["hash"] != current_hash:
+        compile_bundle(market_name, market_id, name, path)
+
+    return load_bundle(path)
@@ -10,6 +10,8 @@ Name developers
 import os
 import argparse
 
+CDA_TYPES = ["GS", "GS evo", "GS active", "GS vec", "GS sharded", "TD", "TD evo"]
+
 def set_arguments():
     """
     Set the necessary command-line arguments for cda.py
@@ -22,7 +24,7 @@ def set_arguments():
         "market_id", type=int, help="id of market of the given simulation to to run"
     )
     parser.add_argument(
-        "cda_type", type=str, choices=["GS", "GS evo", "TD", "TD evo"], help="type of cda market to run"
+        "cda_type", type=str, choices=CDA_TYPES, help="type of cda market to run"
     )
     parser.add_argument(
         "N", type=int, help="amount of simulations"
@@ -33,6 +35,30 @@ def set_arguments():
     parser.add_argument(
         "--log", type=str2bool, default=False, help="run with logfile or not (default=True)"
     )
+    parser.add_argument(
+        "--stream", type=str2bool, default=False, 
+        help="write the data of each simulation to disk as soon as it finishes (default=False)"
+    )
+    parser.add_argument(
+        "--output", type=str, default="csv", choices=["csv", "parquet", "feather"],
+        help="file format of the saved data (default=csv)"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, 
+        help="master seed from which the seeds of all simulations are derived (default=None)"
+    )
+    parser.add_argument(
+        "--trace", type=str2bool, default=False, 
+        help="write a binary trace of all shouts of each simulation (default=False)"
+    )
+    parser.add_argument(
+        "--no-plots", action="store_true", 
+        help="skip the figures, the csv and stat files are still written (default=False)"
+    )
+    parser.add_argument(
+        "--analyze", action="store_true", 
+        help="analyze the saved data of a previous run instead of running the simulations (default=False)"
+    )
     
     args = parser.parse_args()
 
@@ -48,7 +74,7 @@ def set_arguments():
             "and market id: {}".format(args.name, args.market_id)
             )
 
-    return args.name, market_name, args.market_id, args.cda_type, args.N, args.save_output, args.log
+    return args.name, market_name, args.market_id, args.cda_type, args.N, args.save_output, args.log, args.stream, args.output, args.seed, args.trace, not args.no_plots, args.analyze
 
 def str2bool(v):
     """
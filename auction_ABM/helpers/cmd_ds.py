@@ -17,12 +17,21 @@ def set_arguments():
     parser.add_argument("name", type=str, help="name of the simulation to run")
     parser.add_argument("market_type", type=str, choices=["GS", "TD"], help="market type")
     parser.add_argument("market_id", type=int, help="id of market")
+    parser.add_argument(
+        "--batch", type=int, default=1, 
+        help="amount of markets to generate, with ids starting at market_id (default=1)"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="seed of the generated markets (default=None)")
+    parser.add_argument("--eq_price", type=int, default=None, help="equilibrium price of the markets (default=None)")
+    parser.add_argument(
+        "--eq_quantity", type=int, default=None, help="equilibrium quantity of the markets (default=None)"
+    )
     args = parser.parse_args()
 
     if not do_files_exists(args.market_type, args.market_id, args.name):
         parser.error("cannot find files for simulation with name: {}".format(args.name))
     
-    return args.name, args.market_type, args.market_id
+    return args.name, args.market_type, args.market_id, args.batch, args.seed, args.eq_price, args.eq_quantity
 
 def do_files_exists(market_type, market_id, name):
     """
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import argparse
+
+from auction_ABM.helpers.cmd_cda import str2bool, do_files_exists, CDA_TYPES
+from auction_ABM.runners.sweep_runner import market_name
+
+def set_arguments():
+    """
+    Set the necessary command-line arguments for sweep.py
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "N", type=int, help="amount of simulations per combination of market, name and cda type"
+    )
+    parser.add_argument(
+        "--market_ids", type=int, nargs="+", required=True, help="ids of the markets to run"
+    )
+    parser.add_argument(
+        "--names", type=str, nargs="+", required=True, 
+        help="names of the simulations (distributions of agents) to run on each market"
+    )
+    parser.add_argument(
+        "--cda_types", type=str, nargs="+", required=True, choices=CDA_TYPES, 
+        help="types of cda markets to run"
+    )
+    parser.add_argument(
+        "--save_output", type=str2bool, default=True, help="save data transaction or not (default=True)"
+    )
+    parser.add_argument(
+        "--log", type=str2bool, default=False, help="run with logfile or not (default=False)"
+    )
+    parser.add_argument(
+        "--output", type=str, default="csv", choices=["csv", "parquet", "feather"],
+        help="file format of the saved data (default=csv)"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, 
+        help="master seed from which the seeds of all simulations are derived (default=None)"
+    )
+    parser.add_argument(
+        "--processes", type=int, default=None, help="amount of worker processes (default=cpu count)"
+    )
+    parser.add_argument(
+        "--no-plots", action="store_true", 
+        help="skip the figures, the csv and stat files are still written (default=False)"
+    )
+
+    args = parser.parse_args()
+
+    for market_id in args.market_ids:
+        for name in args.names:
+            for cda_type in args.cda_types:
+                if not do_files_exists(name, market_name(cda_type), market_id):
+                    parser.error(
+                        "Cannot find appropriate data files for simulation with name: {} " \
+                        "and market id: {}".format(name, market_id)
+                    )
+
+    return (
+        args.market_ids, args.names, args.cda_types, args.N, args.save_output, args.log, 
+        args.output, args.seed, args.processes, not args.no_plots
+    )
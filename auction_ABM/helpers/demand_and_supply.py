@@ -9,79 +9,191 @@ Name developers
 
 import os
 import random
+import shutil
 
 import matplotlib.pyplot as plt
 import numpy as np
 
-def generate_random_DS(min_limit, max_limit, total_buyers, total_sellers, commodities):
+from auction_ABM.helpers.market_curves import MarketCurves
+from auction_ABM.helpers.seeds import replication_rngs
+
+MAX_ATTEMPTS = 100
+BATCH_SIZE = 4096
+
+def generate_random_DS(
+        min_limit, max_limit, total_buyers, total_sellers, commodities, 
+        eq_price=None, eq_quantity=None, rng=None
+    ):
     """
-    Generates demand and supply for a double auction by means of induced value theory
+    Generates demand and supply for a double auction by means of induced value theory.
+    The limit prices are constructed such that the aggregate demand and supply 
+    cross (see constructive_limit_prices), optionally at a given equilibrium price 
+    and/or quantity. Without random generator (numpy) one is seeded from the 
+    random module. Raises a ValueError if the targets are not possible for the 
+    size of the market.
     """
-    eq = ()
-    while len(eq) == 0 or 0 in eq:
-        prices = random_limit_prices(min_limit, max_limit, total_buyers, total_sellers, commodities)
-        prices_buy, prices_sell, all_prices_buy, all_prices_sell = prices
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+
+    if commodities < 3:
+        raise ValueError("At least 3 commodities are needed for a valid market")
+    if max_limit - min_limit < 2:
+        raise ValueError("No equilibrium price possible within ({}, {})".format(min_limit, max_limit))
+    if eq_price is not None and not min_limit < eq_price < max_limit:
+        raise ValueError("Equilibrium price should lie within ({}, {})".format(min_limit, max_limit))
+
+    crossings = feasible_crossings(total_buyers, total_sellers, commodities)
+    if not crossings:
+        raise ValueError(
+            "Demand and supply of {} buyers and {} sellers cannot cross with surplus for both "
+            "sides in {} commodities, more commodities are needed".format(total_buyers, total_sellers, commodities)
+        )
+
+    # the equilibrium quantity is the demand at the crossing, so a multiple of the buyers
+    crossing = None
+    if eq_quantity is not None:
+        quantities = [total_buyers * (crossing + 1) for crossing in crossings]
+        if eq_quantity not in quantities:
+            raise ValueError(
+                "Equilibrium quantity should be one of {} for {} buyers and {} sellers "
+                "with {} commodities".format(quantities, total_buyers, total_sellers, commodities)
+            )
+        crossing = eq_quantity // total_buyers - 1
+
+    # the crossing holds by construction, only a surplus that adds up to zero
+    # or limit prices equal to the common price that move the crossing (both
+    # by chance) are drawn again, the same as the original generator did
+    for _ in range(MAX_ATTEMPTS):
+        prices_buy, prices_sell = constructive_limit_prices(
+            rng, min_limit, max_limit, commodities, crossings, eq_price, crossing, 
+            total_buyers == total_sellers
+        )
+        all_prices_buy, all_prices_sell = prices_buy * total_buyers, prices_sell * total_sellers
+        all_prices_buy.sort(reverse=True)
+        all_prices_sell.sort()
 
         eq = determine_equilibrium(prices_buy, prices_sell, all_prices_buy, all_prices_sell, total_buyers, total_sellers)
+        if len(eq) > 0 and 0 not in eq and eq_price in (None, eq[0]) and eq_quantity in (None, eq[1]):
+            return prices_buy, prices_sell, all_prices_buy, all_prices_sell, eq
 
-    return prices_buy, prices_sell, all_prices_buy, all_prices_sell, eq
+    raise ValueError("No valid market found in {} attempts".format(MAX_ATTEMPTS))
 
-def random_limit_prices(min_price, max_price, total_buyers, total_sellers, commodities):
+def feasible_crossings(total_buyers, total_sellers, commodities):
     """
-    Generates a set of random limit prices by means of the induces value theorem
-    of V. Smith (1976). Note, it makes sure that at least one of the commodities
-    can be traded.
+    Returns the commodities at which the aggregate demand and supply can cross,
+    each with the amounts of units a seller can have priced at or below the
+    equilibrium price. On the aggregate curves each limit price of a buyer 
+    (seller) counts total_buyers (total_sellers) times. The crossing is at 
+    commodity i (not the first or last, so both sides have surplus) if the 
+    sellers supply more than the buyers demand at all higher limit prices of 
+    the buyers and not at the i-th: total_buyers * i < total_sellers * units 
+    <= total_buyers * (i + 1).
     """
-
-    # generate limit prices untill they are valid (trades are possible)
-    valid_prices = False
-    while not valid_prices:
-
-        # generate random limit prices and sort them
-        prices_buy = [random.randint(min_price, max_price) for _ in range(commodities)]
-        prices_sell = [random.randint(min_price, max_price) for _ in range(commodities)]
-        prices_buy.sort(reverse=True), prices_sell.sort()
-        valid_prices = is_valid_prices(prices_buy, prices_sell, commodities)
-
-    # generate prices list for demand and supply schedule
-    all_prices_buy, all_prices_sell = prices_buy * total_buyers, prices_sell * total_sellers
-    all_prices_buy.sort(reverse=True)
-    all_prices_sell.sort()
-    
-    return prices_buy, prices_sell, all_prices_buy, all_prices_sell
-
-def is_valid_prices(prices_buy, prices_sell, commodities):
+    crossings = {}
+    for crossing in range(1, commodities - 1):
+        units = [
+            units for units in range(1, commodities + 1)
+            if total_buyers * crossing < total_sellers * units <= total_buyers * (crossing + 1)
+        ]
+        if units:
+            crossings[crossing] = units
+
+    return crossings
+
+def constructive_limit_prices(
+        rng, min_price, max_price, commodities, crossings, eq_price=None, crossing=None, baseline=True
+    ):
     """
-    Checks if any trades are possible. If so it make sure 
-    only one unique equilibrium exists by ensuring a common price for the buyers
-    and sellers.
+    Generates a set of limit prices (buyers highest-to-lowest, sellers 
+    lowest-to-highest) whose aggregate demand and supply cross at commodity 
+    crossing with common price eq_price. The buyers value
+    the first crossing commodities above the common price, the sellers price
+    one of the feasible amounts of units (see feasible_crossings) at or below
+    it, the other limit prices lie on the other side of it. 
+
+    Without targets the market is drawn as the original generator would give
+    it (see draw_market), conditioned on a feasible crossing. A missing target
+    is drawn from its distribution under the original generator and the 
+    prices are drawn uniformly on their side of the common price (as the 
+    other prices of the original generator are given the crossing). Without
+    baseline (unequal sides, which the original generator could not give) 
+    only the price follows the original generator, the crossing is drawn 
+    uniformly over the feasible commodities.
     """
+    prices_buy = prices_sell = None
+    if eq_price is None or (crossing is None and baseline):
+        feasible = crossings if baseline else range(1, commodities - 1)
+        drawn_price, drawn_crossing, drawn_buy, drawn_sell = draw_market(
+            rng, min_price, max_price, commodities, feasible
+        )
+        if baseline and eq_price is None and crossing is None:
+            prices_buy, prices_sell = drawn_buy, drawn_sell
+        if eq_price is None:
+            eq_price = drawn_price
+        if crossing is None and baseline:
+            crossing = drawn_crossing
+    if crossing is None:
+        crossing = int(rng.choice(list(crossings)))
+    units = int(rng.choice(crossings[crossing]))
+
+    if prices_buy is None:
+        prices_buy = np.concatenate([
+            np.sort(rng.integers(eq_price + 1, max_price, size=crossing, endpoint=True))[::-1],
+            [eq_price],
+            np.sort(rng.integers(min_price, eq_price - 1, size=commodities - crossing - 1, endpoint=True))[::-1]
+        ])
+    if prices_sell is None:
+        prices_sell = np.concatenate([
+            np.sort(rng.integers(min_price, eq_price - 1, size=units - 1, endpoint=True)),
+            [eq_price],
+            np.sort(rng.integers(eq_price + 1, max_price, size=commodities - units, endpoint=True))
+        ])
+
+    return prices_buy.astype(int).tolist(), prices_sell.astype(int).tolist()
+
+def draw_market(rng, min_price, max_price, commodities, crossings):
+    """
+    Draws a market from the original generator, conditioned on a crossing 
+    that is feasible (in crossings). Batches of markets are drawn the original
+    way (see baseline_markets) and the first one with a feasible crossing is
+    used. Returns its equilibrium price, crossing and limit prices. Raises a 
+    ValueError if no market does within MAX_ATTEMPTS batches.
+    """
+    for _ in range(MAX_ATTEMPTS):
+        drawn_crossings, drawn_prices, prices_buy, prices_sell = baseline_markets(
+            rng, min_price, max_price, commodities, BATCH_SIZE
+        )
+        valid = np.isin(drawn_crossings, list(crossings))
+        if valid.any():
+            i = np.argmax(valid)
+            return int(drawn_prices[i]), int(drawn_crossings[i]), prices_buy[i], prices_sell[i]
+
+    raise ValueError("No market with a feasible crossing found in {} attempts".format(MAX_ATTEMPTS))
+
+def baseline_markets(rng, min_price, max_price, commodities, size):
+    """
+    Draws a batch of markets as the original generator did (V. Smith (1976),
+    independent uniform limit prices, buyers sorted highest-to-lowest and 
+    sellers lowest-to-highest) and inserts the common price at the crossing:
+    the first commodity (not the last) at which the price of the buyer is not
+    above the price of the seller. The common price is the price of the buyer
+    or seller there (or of the previous seller) that keeps demand and supply
+    resp. decreasing and increasing. Returns the crossings, common prices and
+    limit prices. The crossing is -1 if the prices do not cross.
+    """
+    prices_buy = -np.sort(-rng.integers(min_price, max_price, size=(size, commodities), endpoint=True), axis=1)
+    prices_sell = np.sort(rng.integers(min_price, max_price, size=(size, commodities), endpoint=True), axis=1)
+    crossed = prices_buy[:, :-1] <= prices_sell[:, :-1]
+    crossings = np.where(crossed.any(axis=1), np.argmax(crossed, axis=1), -1)
 
-    # ensures that at least one trade is possible
-    min_sell, max_buy = min(prices_sell), max(prices_buy)
-    if min_sell >= max_buy:
-        return False
-
-    # ensures a common price (equilibrium) price
-    for commodity in range(commodities):
-
-        # if price to buy become lower that price to sell it means then it means
-        # afterwards no trades are possible so we make this our equilibrium point
-        if prices_buy[commodity] <= prices_sell[commodity] and commodity != commodities - 1:
-
-            # makes sure a valid equilibrium price  is inserted, so that the
-            # demand and supply are still resp decreasing and increasing
-            if prices_buy[commodity] >= prices_sell[commodity - 1]:
-                prices_sell[commodity] = prices_buy[commodity]
-            elif prices_sell[commodity] <= prices_buy[commodity - 1]:
-                prices_buy[commodity] = prices_sell[commodity]
-            else:
-                prices_buy[commodity] = prices_sell[commodity - 1]
-                prices_sell[commodity] = prices_sell[commodity - 1]
-                
-            return True
+    # the first commodity has no previous one, such crossings are never feasible
+    rows, k = np.arange(size), np.maximum(crossings, 1)
+    buy, sell = prices_buy[rows, k], prices_sell[rows, k]
+    prev_buy, prev_sell = prices_buy[rows, k - 1], prices_sell[rows, k - 1]
+    prices = np.where(buy >= prev_sell, buy, np.where(sell <= prev_buy, sell, prev_sell))
+    prices_buy[rows, k] = prices_sell[rows, k] = prices
 
-    return False
+    return crossings, prices, prices_buy, prices_sell
 
 def demand(p, valuations):
     """
@@ -123,54 +235,8 @@ def determine_equilibrium(prices_buy, prices_sell, all_prices_buy, all_prices_se
     """
     Determines the equlibrium for given sets of valuations
     """
-
-    # variable to keep track of surplus of market and others to assist in
-    # calculation equilibrium
-    surplus = 0
-    prev_buy, prev_sell = 0, 0
-    prev_buy_left, prev_sell_left = 0, 0
-
-    # start calculation following the Marshalian path
-    for i, (buy, sell) in enumerate(zip(prices_buy, prices_sell)):
-        excess_demand_buy = demand_minus_supply(buy, all_prices_buy, all_prices_sell)
-        
-        # if more buyers than sellers make sure that previous buyers sell their
-        # commodities first; keep track for next commodities
-        if total_buyers > total_sellers:
-            if prev_buy_left > 0:
-                surplus += (prev_buy - sell) * prev_buy_left
-
-            trades = total_sellers - prev_buy_left
-            prev_buy_left = total_buyers - trades
-            prev_buy = buy
-        
-        # if equal amoun or more sellers (same story as above)
-        else:
-            if prev_sell_left > 0:
-                surplus += (buy - prev_sell) * prev_sell_left
-
-            trades = total_buyers - prev_sell_left
-            prev_sell_left = total_sellers - trades
-            prev_sell = sell
-
-        # update surplus market
-        surplus += (buy - sell) * trades
-
-        # crosspoint demand and supply found, so equilbrium found and search can be stopped
-        if excess_demand_buy >= 0:
-            q = demand(buy, all_prices_buy)
-
-            # determine equilbrium surplus for a buyer and seller in the market
-            buy_surplus, sell_surplus = 0, 0
-            for commodity in range(i + 1):
-                buy_surplus += prices_buy[commodity] - buy
-                sell_surplus += buy - prices_sell[commodity]
-
-            # return equilibrium values
-            return buy, q, surplus, buy_surplus, sell_surplus
-
-    # return empty equilibrium value, if something might have gone wrong
-    return ()
+    curves = MarketCurves(all_prices_buy, all_prices_sell)
+    return curves.equilibrium(prices_buy, prices_sell, total_buyers, total_sellers)
 
 def save_prices(prices_buy, prices_sell, equilibrium, market_name, market_id):
     """
@@ -195,6 +261,37 @@ def save_prices(prices_buy, prices_sell, equilibrium, market_name, market_id):
         f.write("Buyer surplus\t{}\n".format(buy_surplus))
         f.write("Seller surplus\t{}\n".format(sell_surplus))
 
+def generate_markets(
+        market_name, market_ids, name, min_limit, max_limit, total_buyers, total_sellers, 
+        commodities, eq_price=None, eq_quantity=None, seed=None
+    ):
+    """
+    Generates a batch of markets and saves each to its own folder 
+    ({market_name}_market_{id}). The random stream of a market is derived 
+    from the seed and its id, so a market does not depend on the rest of the
+    batch. The parameters (folder name) of the first market are copied to the
+    others, such that simulations can be run on each market. Returns the 
+    equilibria of the markets.
+    """
+    source = os.path.join("{}_market_{}".format(market_name, market_ids[0]), name)
+    equilibria = []
+    for market_id in market_ids:
+        _, rng = replication_rngs(seed, market_id)
+        ds_results = generate_random_DS(
+            min_limit, max_limit, total_buyers, total_sellers, commodities, 
+            eq_price, eq_quantity, rng
+        )
+        prices_buy, prices_sell, _, _, equilibrium = ds_results
+
+        folder = os.path.join("{}_market_{}".format(market_name, market_id))
+        os.makedirs(folder, exist_ok=True)
+        if os.path.isdir(source) and not os.path.isdir(os.path.join(folder, name)):
+            shutil.copytree(source, os.path.join(folder, name))
+
+        save_prices(prices_buy, prices_sell, equilibrium, market_name, market_id)
+        equilibria.append(equilibrium)
+
+    return equilibria
 
 def plot_demand_supply(
         prices_buy, prices_sell, all_prices_buy, all_prices_sell, 
@@ -209,8 +306,9 @@ def plot_demand_supply(
     folder = os.path.join("{}_market_{}".format(market_name, market_id))
     os.makedirs(folder, exist_ok=True)
     filename = os.path.join(folder, "market.pdf")
-    q_demand = [demand(p, all_prices_buy) for p in prices_buy]
-    q_supply = [supply(p, all_prices_sell) for p in prices_sell]
+    curves = MarketCurves(all_prices_buy, all_prices_sell)
+    q_demand = curves.demand(prices_buy).tolist()
+    q_supply = curves.supply(prices_sell).tolist()
 
     # extand last value so the plot will be a bit more smoothned
     q_demand.append(q_demand[-1] + total_buyers)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import numpy as np
+import pandas as pd
+
+from auction_ABM.agents.trader import STRATEGY_CODES, STRATEGY_NAMES
+
+class StrategyCounter:
+    """
+    Amount of traders per market side and strategy in an evolutionary
+    tournament. The counts are set once from the initial population and then
+    updated on every switch of strategy, so the population never has to be
+    walked to count it. The counts and convergence statistics (switches,
+    switch rate and entropy of the mix of strategies) are recorded per period
+    in preallocated arrays.
+    """
+    def __init__(self, agents, periods):
+        """
+        Initialize counter with the initial population of agents (list) and
+        the maximum amount of periods to record (int)
+        """
+        self.counts = np.zeros((2, len(STRATEGY_CODES)), dtype=np.int64)
+        self.strategies = []
+        for agent in agents:
+            self.counts[agent.side, agent.code] += 1
+            if agent.code not in self.strategies:
+                self.strategies.append(agent.code)
+        self.population = len(agents)
+
+        self.switches = 0
+        self.periods_no_switches = 0
+        self.size = 0
+        self.periods = np.zeros(periods, dtype=np.int64)
+        self.history = np.zeros((periods, len(STRATEGY_CODES)), dtype=np.int64)
+        self.history_switches = np.zeros(periods, dtype=np.int64)
+        self.history_entropy = np.zeros(periods)
+
+    def switch(self, side, old_strategy, new_strategy):
+        """
+        Moves a trader of the given side from its old to its new strategy
+        """
+        old_code, new_code = STRATEGY_CODES[old_strategy.upper()], STRATEGY_CODES[new_strategy.upper()]
+        self.counts[side, old_code] -= 1
+        self.counts[side, new_code] += 1
+        if new_code not in self.strategies:
+            self.strategies.append(new_code)
+
+    def end_imitation(self, switches):
+        """
+        Registers the amount of switches of an imitation round and updates
+        the amount of consecutive periods without switches
+        """
+        self.switches = switches
+        if switches > 0:
+            self.periods_no_switches = 0
+        else:
+            self.periods_no_switches += 1
+
+    def totals(self):
+        """
+        Returns the amount of traders per strategy over both market sides
+        """
+        return self.counts.sum(axis=0)
+
+    def entropy(self):
+        """
+        Returns the Shannon entropy (nats) of the mix of strategies
+        """
+        p = self.totals() / self.population
+        p = p[p > 0]
+        return float(-np.sum(p * np.log(p)))
+
+    def record(self, period):
+        """
+        Records the counts of the current period and the switches that led
+        to them
+        """
+        self.periods[self.size] = period
+        self.history[self.size] = self.totals()
+        self.history_switches[self.size] = self.switches
+        self.history_entropy[self.size] = self.entropy()
+        self.size += 1
+
+    def get_dataframe(self, unique_id):
+        """
+        Returns dataframe with a row per recorded period: the amount of
+        traders per strategy and the convergence statistics
+        """
+        df = pd.DataFrame({"ID": unique_id, "Period": self.periods[:self.size]})
+        for code in self.strategies:
+            df[STRATEGY_NAMES[code]] = self.history[:self.size, code]
+        df["Switches"] = self.history_switches[:self.size]
+        df["Switch rate"] = self.history_switches[:self.size] / self.population
+        df["Entropy"] = self.history_entropy[:self.size]
+
+        return df
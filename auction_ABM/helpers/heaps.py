@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import heapq
+
+class LazyHeap:
+    """
+    Min-heap of items identified by an id (e.g. id of an agent) with lazy
+    deletion: updating or removing an item leaves its old entry in the heap,
+    which is only discarded once it reaches the top. Setting, removing and
+    peeking at the smallest item are therefore O(log n) amortized.
+    """
+    def __init__(self):
+        """
+        Initialize an empty heap
+        """
+        self.heap = []
+        self.keys = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, item_id):
+        return item_id in self.keys
+
+    def get(self, item_id, default=None):
+        """
+        Returns the current key of an item
+        """
+        return self.keys.get(item_id, default)
+
+    def set(self, item_id, key):
+        """
+        Inserts item with given key or updates the key of an existing item
+        """
+        if self.keys.get(item_id) == key:
+            return
+
+        self.keys[item_id] = key
+        heapq.heappush(self.heap, (key, item_id))
+
+        # rebuild the heap if it mostly consists of outdated entries
+        if len(self.heap) > 2 * len(self.keys) + 32:
+            self.heap = [(key, item_id) for item_id, key in self.keys.items()]
+            heapq.heapify(self.heap)
+
+    def remove(self, item_id):
+        """
+        Removes item from heap (if present)
+        """
+        self.keys.pop(item_id, None)
+
+    def clear(self):
+        """
+        Removes all items from heap
+        """
+        self.heap, self.keys = [], {}
+
+    def peek(self):
+        """
+        Returns the (key, id) of the item with the smallest key, None if empty
+        """
+        heap, keys = self.heap, self.keys
+        while heap:
+            key, item_id = heap[0]
+            if item_id in keys and keys[item_id] == key:
+                return key, item_id
+            heapq.heappop(heap)
+
+        return None
+
+    def pop(self):
+        """
+        Removes and returns the (key, id) of the item with the smallest key,
+        None if empty
+        """
+        top = self.peek()
+        if top is not None:
+            heapq.heappop(self.heap)
+            del self.keys[top[1]]
+
+        return top
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+class MarketContext:
+    """
+    Market-level values the Kaplan traders compare against to determine their
+    activity, computed once per time step instead of by every trader. The
+    values that depend on the outstanding bid and ask and the trading prices
+    of the previous period are only recomputed after the model invalidates
+    them (on a change of quotes or a new period), the values that depend on
+    the time are recomputed every step.
+    """
+    def __init__(self, model):
+        """
+        Initialize context for the given auction
+        """
+        self.model = model
+        self.stale = True
+
+        # outstanding bid and ask compared to the previous period
+        self.buyers_juicy_offer = False
+        self.sellers_juicy_offer = False
+        self.buyers_reasonable_offer = False
+        self.sellers_reasonable_offer = False
+        self.spread = 0
+
+        # time passed and steps without transactions
+        self.time_left = 1
+        self.exceeds_half = False
+        self.many_no_transactions = False
+        self.twothird_remaining = 0
+
+    def invalidate(self):
+        """
+        Marks the values that depend on the quotes as outdated
+        """
+        self.stale = True
+
+    def update(self):
+        """
+        Updates the context at the start of a time step
+        """
+        model = self.model
+        if self.stale:
+            best_bid, best_ask = model.best_bid, model.best_ask
+            self.buyers_juicy_offer = best_ask < model.prev_min_trade
+            self.sellers_juicy_offer = best_bid > model.prev_max_trade
+            self.buyers_reasonable_offer = best_ask < model.prev_max_trade
+            self.sellers_reasonable_offer = best_bid > model.prev_min_trade
+            self.spread = best_ask - best_bid
+            self.stale = False
+
+        remaining_steps = model.total_time - model.time
+        self.time_left = 1 - model.time / model.total_time
+        self.exceeds_half = model.no_transactions > 0.5 * remaining_steps
+        self.many_no_transactions = model.no_transactions > 5
+        self.twothird_remaining = 2 / 3 * remaining_steps
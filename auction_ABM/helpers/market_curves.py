@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import numpy as np
+
+class MarketCurves:
+    """
+    Demand and supply step functions of a market. The valuations of all
+    buyers and sellers are sorted once, after which the quantity demanded or
+    supplied at any (array of) price(s) follows from a binary search
+    (np.searchsorted) instead of a scan over all valuations.
+    """
+    def __init__(self, all_prices_buy, all_prices_sell):
+        """
+        Initialize curves with the valuations of all units of the buyers and
+        sellers (lists or arrays, in any order)
+        """
+        self.valuations_buy = np.sort(np.asarray(all_prices_buy))
+        self.valuations_sell = np.sort(np.asarray(all_prices_sell))
+
+    def demand(self, p):
+        """
+        Returns the quantity demanded at price(s) p, i.e. the amount of
+        valuations of buyers of at least p
+        """
+        return len(self.valuations_buy) - np.searchsorted(self.valuations_buy, p, side="left")
+
+    def supply(self, p):
+        """
+        Returns the quantity supplied at price(s) p, i.e. the amount of
+        valuations of sellers of at most p
+        """
+        return np.searchsorted(self.valuations_sell, p, side="right")
+
+    def excess_demand(self, p):
+        """
+        Returns the excess demand at price(s) p
+        """
+        return self.demand(p) - self.supply(p)
+
+    def equilibrium(self, prices_buy, prices_sell, total_buyers, total_sellers):
+        """
+        Determines the equilibrium (price, quantity, surplus, surplus of a
+        buyer, surplus of a seller) along the Marshallian path over the
+        commodities, the same as determine_equilibrium. The crosspoint is the
+        first limit price of the buyers without excess supply, the surplus
+        accumulates the trades of all commodities up to that point, where the
+        units left over by the larger side of the market trade first.
+        Returns an empty tuple if the curves do not cross.
+        """
+        prices_buy = np.asarray(prices_buy, dtype=np.int64)
+        prices_sell = np.asarray(prices_sell, dtype=np.int64)
+
+        crossed = np.flatnonzero(self.excess_demand(prices_buy) >= 0)
+        if len(crossed) == 0:
+            return ()
+
+        # commodities traded up to and including the crosspoint
+        i = crossed[0]
+        buy, sell = prices_buy[:i + 1], prices_sell[:i + 1]
+
+        # units left over from the previous commodity and trades of the current one
+        diff = abs(total_buyers - total_sellers)
+        left = np.arange(i + 1) * diff
+        trades = min(total_buyers, total_sellers) - left
+        if total_buyers > total_sellers:
+            surplus_left = (np.roll(buy, 1) - sell) * left
+        else:
+            surplus_left = (buy - np.roll(sell, 1)) * left
+        surplus = np.sum(surplus_left[1:]) + np.sum((buy - sell) * trades)
+
+        price = prices_buy[i]
+        buy_surplus = np.sum(buy) - (i + 1) * price
+        sell_surplus = (i + 1) * price - np.sum(sell)
+
+        return int(price), int(self.demand(price)), int(surplus), int(buy_surplus), int(sell_surplus)
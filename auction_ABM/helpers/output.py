@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow.dataset as pads
+except ImportError:
+    pads = None
+
+# kinds of data returned by a simulation, in the order of CDA.step
+KINDS = ["transactions", "periods", "agents", "periods_agents", "evo_process"]
+CSV_SUFFIXES = {
+    "transactions": "_transactions.csv",
+    "periods": "_periods.csv",
+    "agents": "_agents.csv",
+    "periods_agents": "_periods_agents.csv",
+    "evo_process": "evo_process.csv"
+}
+AGENT_INDEX = ["Step", "AgentID"]
+
+def get_output(backend, filename):
+    """
+    Returns output backend (csv, parquet or feather) for the given filename
+    """
+    if backend == "csv":
+        return CSVOutput(filename)
+    elif backend in ("parquet", "feather"):
+        return ArrowOutput(filename, backend)
+
+    raise ValueError("Unknown output backend: {}".format(backend))
+
+def compact_dtypes(df):
+    """
+    Returns dataframe with compact dtypes: 32-bit integers and floats and
+    categories for strings
+    """
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        if dtype.kind in "iu":
+            dtypes[column] = "int32"
+        elif dtype.kind == "f":
+            dtypes[column] = "float32"
+        elif dtype.kind == "O":
+            dtypes[column] = "category"
+
+    return df.astype(dtypes)
+
+class CSVOutput:
+    """
+    Writes the data of all simulations to a single csv file per kind of data.
+    """
+    def __init__(self, filename):
+        """
+        Initialize output with the filename (without suffix) of the run
+        """
+        self.filename = filename
+        self.first = True
+
+    def path(self, kind):
+        return self.filename + CSV_SUFFIXES[kind]
+
+    def write(self, result):
+        """
+        Writes the dataframes of one or more simulations, the first write
+        overwrites existing files and the later ones are appended
+        """
+        for kind, df in zip(KINDS, result):
+            df.to_csv(self.path(kind), mode="w" if self.first else "a", header=self.first)
+        self.first = False
+
+    def load(self, kind, columns=None, ids=None):
+        """
+        Loads the data of a kind, optionally only the given columns and the
+        simulations with the given ids
+        """
+        index_col = [0, 1] if kind in ("agents", "periods_agents") else 0
+        df = pd.read_csv(self.path(kind), index_col=index_col)
+        if ids is not None:
+            df = df[df["ID"].isin(ids)]
+
+        return df if columns is None else df[columns]
+
+class ArrowOutput:
+    """
+    Writes the data to a Parquet or Feather dataset per kind of data, which is
+    partitioned on the simulation (folder/kind/ID=n/part.parquet). The folder
+    is named after the run and market, such that every run, market and
+    simulation has its own partition. Data is stored with compact dtypes and
+    loaded lazily, i.e. only the requested columns and partitions are read.
+    """
+    def __init__(self, filename, file_format="parquet"):
+        """
+        Initialize output with the filename (without suffix) of the run and
+        the file format (parquet or feather)
+        """
+        if pads is None:
+            raise ImportError("pyarrow is required for the {} output".format(file_format))
+
+        self.folder = filename
+        self.file_format = file_format
+        self.first = True
+
+    def path(self, kind):
+        return os.path.join(self.folder, kind)
+
+    def write(self, result):
+        """
+        Writes the dataframes of one or more simulations, existing data of
+        the run is removed on the first write
+        """
+        if self.first and os.path.isdir(self.folder):
+            shutil.rmtree(self.folder)
+        self.first = False
+
+        for kind, df in zip(KINDS, result):
+            if isinstance(df.index, pd.MultiIndex):
+                df = df.reset_index()
+            df = compact_dtypes(df.reset_index(drop=True))
+
+            for sim_id, df_sim in df.groupby("ID", observed=True):
+                folder = os.path.join(self.path(kind), "ID={}".format(sim_id))
+                os.makedirs(folder, exist_ok=True)
+                df_sim = df_sim.drop(columns="ID").reset_index(drop=True)
+                name = os.path.join(folder, "part.{}".format(self.file_format))
+                if self.file_format == "parquet":
+                    df_sim.to_parquet(name, index=False)
+                else:
+                    df_sim.to_feather(name)
+
+    def load(self, kind, columns=None, ids=None):
+        """
+        Loads the data of a kind, optionally only the given columns and the
+        simulations with the given ids
+        """
+        dataset = pads.dataset(
+            self.path(kind), format="ipc" if self.file_format == "feather" else "parquet",
+            partitioning="hive"
+        )
+        flt = None if ids is None else pads.field("ID").isin(list(ids))
+        df = dataset.to_table(columns=columns, filter=flt).to_pandas()
+
+        if columns is None and kind in ("agents", "periods_agents"):
+            df = df.set_index(AGENT_INDEX)
+
+        return df
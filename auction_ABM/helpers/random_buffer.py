@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import itertools
+
+class UniformBuffer:
+    """
+    Pre-generates blocks of uniform random numbers in [0, 1) with a NumPy
+    generator and hands them out one at a time through next, a plain iterator
+    over the blocks (no bookkeeping in Python), which is cheaper per number
+    than random.uniform. The numbers only depend on the state of the
+    generator, so they are reproducible given the seed of the model.
+    """
+    def __init__(self, rng, size=65536):
+        """
+        Initialize buffer with:
+
+        rng: random generator to draw the blocks from (numpy.random.Generator)
+        size: amount of numbers drawn at once (int)
+        """
+        self.rng = rng
+        self.size = size
+        self.next = itertools.chain.from_iterable(iter(self.draw_block, None)).__next__
+
+    def draw_block(self):
+        """
+        Returns a new block of uniform numbers
+        """
+        return self.rng.random(self.size).tolist()
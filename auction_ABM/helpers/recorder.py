@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+from operator import attrgetter
+
+import numpy as np
+import pandas as pd
+
+def value_dtype(value):
+    """
+    Returns the dtype needed to store a single value in a column
+    """
+    if value is None or isinstance(value, (float, np.floating)):
+        return np.dtype(np.float64)
+    if isinstance(value, (bool, np.bool_)):
+        return np.dtype(bool)
+    if isinstance(value, (int, np.integer)):
+        return np.dtype(np.int64)
+
+    return np.dtype(object)
+
+class ColumnBuffer:
+    """
+    Growable, preallocated array for a single column of data. The capacity
+    doubles when full and the dtype is widened (e.g. int to float) when a
+    value does not fit the current one. Missing values (None) are stored as NaN.
+    """
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.data = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, dtype, extra):
+        """
+        Makes sure that the buffer can hold extra values of the given dtype
+        """
+        needed = self.size + extra
+        if self.data is None:
+            self.data = np.empty(max(self.capacity, needed), dtype=dtype)
+            return
+
+        new_dtype = np.result_type(self.data.dtype, dtype)
+        if new_dtype != self.data.dtype or needed > len(self.data):
+            capacity = len(self.data)
+            while capacity < needed:
+                capacity *= 2
+
+            data = np.empty(capacity, dtype=new_dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+
+    def append(self, value):
+        """
+        Appends a single value
+        """
+        dtype = value_dtype(value)
+        if self.data is None or self.size == len(self.data) or dtype != self.data.dtype:
+            self.reserve(dtype, 1)
+
+        self.data[self.size] = np.nan if value is None and self.data.dtype != object else value
+        self.size += 1
+
+    def extend(self, values):
+        """
+        Appends an array (or list) of values
+        """
+        values = np.asarray(values)
+        if values.dtype.kind in "USO":
+            values = values.astype(object)
+
+        self.reserve(values.dtype, len(values))
+        self.data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def values(self):
+        """
+        Returns the stored values
+        """
+        if self.data is None:
+            return np.empty(0)
+
+        return self.data[:self.size]
+
+class ColumnRecorder:
+    """
+    Replacement of the Mesa DataCollector that stores data in columns of
+    preallocated arrays instead of a dict row per agent. Model reporters are
+    recorded on every collect, agent reporters only for snapshots: when
+    explicitly asked for or on every snapshot_interval-th collect (never if 0).
+    The dataframes are in the same format as the ones of the DataCollector.
+    """
+    def __init__(self, model_reporters=None, agent_reporters=None, snapshot_interval=0):
+        """
+        Initialize recorder with:
+
+        model_reporters: name of column and attribute name or function of model (dict)
+        agent_reporters: name of column and attribute name or function of agent (dict)
+        snapshot_interval: amount of collects between automatic agent snapshots (int)
+        """
+        self.model_reporters = {
+            name: attrgetter(reporter) if isinstance(reporter, str) else reporter
+            for name, reporter in (model_reporters or {}).items()
+        }
+        self.agent_reporters = {
+            name: attrgetter(reporter) if isinstance(reporter, str) else reporter
+            for name, reporter in (agent_reporters or {}).items()
+        }
+        self.snapshot_interval = snapshot_interval
+        self.model_vars = {name: ColumnBuffer() for name in self.model_reporters}
+        self.agent_vars = {name: ColumnBuffer() for name in ["Step", "AgentID"] + list(self.agent_reporters)}
+        self.collects = 0
+
+    def snapshot_due(self):
+        """
+        Returns True if the last collect should include a snapshot of the agents
+        """
+        return self.snapshot_interval > 0 and self.collects % self.snapshot_interval == 0
+
+    def collect(self, model, snapshot=False):
+        """
+        Records the model reporters and, if required, a snapshot of the agents
+        """
+        for name, reporter in self.model_reporters.items():
+            self.model_vars[name].append(reporter(model))
+
+        self.collects += 1
+        if self.agent_reporters and (snapshot or self.snapshot_due()):
+            self.collect_agents(model)
+
+    def collect_agents(self, model):
+        """
+        Records the agent reporters for all agents in the scheduler
+        """
+        agents = model.schedule.agents
+        self.agent_vars["Step"].extend(np.full(len(agents), model.schedule.steps))
+        self.agent_vars["AgentID"].extend([agent.unique_id for agent in agents])
+        for name, reporter in self.agent_reporters.items():
+            self.agent_vars[name].extend([reporter(agent) for agent in agents])
+
+    def get_model_vars_dataframe(self):
+        """
+        Returns dataframe with a column per model reporter and a row per collect
+        """
+        return pd.DataFrame({name: column.values() for name, column in self.model_vars.items()})
+
+    def get_agent_vars_dataframe(self):
+        """
+        Returns dataframe with a column per agent reporter and a row per agent
+        per snapshot, indexed on the step and id of the agent
+        """
+        df = pd.DataFrame({name: column.values() for name, column in self.agent_vars.items()})
+        return df.set_index(["Step", "AgentID"])
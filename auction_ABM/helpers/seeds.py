@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import random
+
+import numpy as np
+
+def replication_rngs(master_seed, replication_id):
+    """
+    Returns the random generators (random.Random, numpy.random.Generator) of
+    a single replication. The streams are derived from the master seed and
+    the id of the replication, such that each replication is reproducible
+    and independent of the other replications and of the order in which they
+    are run. Without master seed fresh entropy is used.
+    """
+    if master_seed is None:
+        seed_seq = np.random.SeedSequence()
+    else:
+        seed_seq = np.random.SeedSequence([master_seed, replication_id])
+
+    seed_python, seed_numpy = seed_seq.spawn(2)
+    state = seed_python.generate_state(4, dtype=np.uint64)
+
+    return random.Random(int.from_bytes(state.tobytes(), "little")), np.random.default_rng(seed_numpy)
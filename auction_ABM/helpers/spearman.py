@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import math
+
+import numpy as np
+from scipy.special import stdtr
+
+def average_ranks(values):
+    """
+    Returns the ranks (1 to n) of the values, tied values get the average of
+    their ranks (same as pandas' rank and scipy's rankdata)
+    """
+    values = np.asarray(values)
+    order = np.argsort(values, kind="mergesort")
+    sorted_values = values[order]
+
+    # first and last position of each group of tied values
+    new_group = np.empty(len(values), dtype=bool)
+    new_group[:1] = True
+    np.not_equal(sorted_values[1:], sorted_values[:-1], out=new_group[1:])
+    starts = np.flatnonzero(new_group)
+    ends = np.append(starts[1:], len(values))
+
+    ranks = np.empty(len(values))
+    ranks[order] = np.repeat((starts + ends + 1) / 2, ends - starts)
+
+    return ranks
+
+def rank_correlation(ranks_x, ranks_y):
+    """
+    Returns the Spearman rank correlation and its two-sided p-value (t-test,
+    same as scipy's spearmanr) for the given ranks. Both are nan for less
+    than two observations or constant ranks.
+    """
+    n = len(ranks_x)
+    if n <= 1 or (ranks_x[0] == ranks_x).all() or (ranks_y[0] == ranks_y).all():
+        return math.nan, math.nan
+
+    corr = np.corrcoef(ranks_x, ranks_y)[1, 0]
+    dof = n - 2
+    with np.errstate(divide="ignore"):
+        t = corr * np.sqrt(max(dof / ((corr + 1.0) * (1.0 - corr)), 0))
+    p = 2 * stdtr(dof, -abs(t))
+
+    return float(corr), float(p)
+
+class RankCorrelation:
+    """
+    Spearman rank correlation between the limit prices of the buyers (ranked
+    highest first) and the sellers (ranked lowest first) of the transactions
+    of a period. The prices are kept in preallocated arrays that grow when
+    full. The ranks are determined once when the correlation is asked for, or
+    kept up to date for every transaction in incremental mode: a new price
+    raises the rank of all higher prices by one (by a half if equal), which
+    gives the correlation at any moment of the period.
+    """
+    def __init__(self, capacity=64, incremental=False):
+        """
+        Initialize buffer for the given amount of transactions
+        """
+        self.incremental = incremental
+        self.size = 0
+        self.keys_buy = np.empty(capacity)
+        self.keys_sell = np.empty(capacity)
+        self.ranks_buy = np.empty(capacity)
+        self.ranks_sell = np.empty(capacity)
+
+    def __len__(self):
+        return self.size
+
+    def grow(self):
+        """
+        Doubles the capacity of the buffer
+        """
+        capacity = 2 * len(self.keys_buy)
+        for name in ("keys_buy", "keys_sell", "ranks_buy", "ranks_sell"):
+            array = np.empty(capacity)
+            array[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, array)
+
+    def append(self, price_buy, price_sell):
+        """
+        Adds the limit prices of the buyer and seller of a transaction
+        """
+        if self.size == len(self.keys_buy):
+            self.grow()
+
+        # buyers are ranked from high to low
+        n = self.size
+        self.keys_buy[n], self.keys_sell[n] = -price_buy, price_sell
+        if self.incremental:
+            self.insert_rank(self.keys_buy, self.ranks_buy, n)
+            self.insert_rank(self.keys_sell, self.ranks_sell, n)
+        self.size += 1
+
+    @staticmethod
+    def insert_rank(keys, ranks, n):
+        """
+        Updates the ranks of the first n keys for the new key at position n
+        """
+        key, previous = keys[n], keys[:n]
+        higher, equal = previous > key, previous == key
+        ranks[:n] += higher + 0.5 * equal
+
+        ties = np.count_nonzero(equal)
+        ranks[n] = n - np.count_nonzero(higher) - ties + 1 + 0.5 * ties
+
+    def clear(self):
+        """
+        Removes all transactions (start of a new period)
+        """
+        self.size = 0
+
+    def ranks(self):
+        """
+        Returns the ranks of the buyers and sellers of the transactions
+        """
+        if self.incremental:
+            return self.ranks_buy[:self.size], self.ranks_sell[:self.size]
+
+        return average_ranks(self.keys_buy[:self.size]), average_ranks(self.keys_sell[:self.size])
+
+    def correlation(self):
+        """
+        Returns the Spearman rank correlation of the transactions and its p-value
+        """
+        return rank_correlation(*self.ranks())
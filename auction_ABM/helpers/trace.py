@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from auction_ABM.agents.trader import BUYER
+
+# fixed-width record of a single shout in the auction
+EVENT_DTYPE = np.dtype([
+    ("period", np.int32),
+    ("time", np.int32),
+    ("agent", np.int32),
+    ("side", np.int8),
+    ("trade", np.bool_),
+    ("offer", np.float64),
+    ("best_bid", np.float64),
+    ("best_ask", np.float64)
+])
+
+class EventTrace:
+    """
+    Binary trace of all shouts in an auction. Records are written into a
+    preallocated ring buffer which is flushed to disk in bulk once full, so
+    tracing costs little more than a single array assignment per shout.
+    The file is only opened while flushing, so a trace that is never written
+    holds no open file. The trace can be read back and rendered as text on 
+    demand.
+    """
+    def __init__(self, path, capacity=65536):
+        """
+        Initialize trace with:
+
+        path: file the records are written to (str)
+        capacity: amount of records kept in memory before flushing (int)
+        """
+        self.path = path
+        self.buffer = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.cursor = 0
+        self.started = False
+
+    @classmethod
+    def for_run(cls, name, unique_id, market_id):
+        """
+        Returns the trace of a single simulation in results/trace/{name}
+        """
+        folder = os.path.join("results", "trace", name)
+        os.makedirs(folder, exist_ok=True)
+        filename = "auction_{}_ID_{}_market_{}.trace".format(name, unique_id, market_id)
+        return cls(os.path.join(folder, filename))
+
+    def record(self, period, time, agent_id, side, trade, offer, best_bid, best_ask):
+        """
+        Adds a single record to the buffer
+        """
+        self.buffer[self.cursor] = (period, time, agent_id, side, trade, offer, best_bid, best_ask)
+        self.cursor += 1
+        if self.cursor == len(self.buffer):
+            self.flush()
+
+    def shout(self, model, agent, trade):
+        """
+        Records the shout of an agent in the current state of the model
+        """
+        self.record(
+            model.period, model.time, agent.unique_id, agent.side,
+            trade, agent.offer, model.best_bid, model.best_ask
+        )
+
+    def flush(self):
+        """
+        Writes the buffered records to disk, the first flush starts a new file
+        """
+        with open(self.path, "ab" if self.started else "wb") as f:
+            f.write(self.buffer[:self.cursor].tobytes())
+        self.started = True
+        self.cursor = 0
+
+    def close(self):
+        """
+        Writes the remaining records to disk
+        """
+        self.flush()
+
+def read_trace(path):
+    """
+    Returns all records of a trace file (structured numpy array)
+    """
+    return np.fromfile(path, dtype=EVENT_DTYPE)
+
+def trace_to_dataframe(records):
+    """
+    Returns dataframe with a row per record
+    """
+    df = pd.DataFrame(records)
+    df["side"] = np.where(df["side"] == BUYER, "buyer", "seller")
+    return df
+
+def render_trace(records):
+    """
+    Returns the records as lines of text
+    """
+    return [
+        "Period: {}, Time: {}, Agent: {} ({}), Offer: {}, Best Bid: {}, Best Ask: {}, Trade: {}".format(
+            r["period"], r["time"], r["agent"], "buyer" if r["side"] == BUYER else "seller",
+            r["offer"], r["best_bid"], r["best_ask"], bool(r["trade"])
+        )
+        for r in records
+    ]
@@ -10,36 +10,119 @@ Name developers
 import os
 from multiprocessing import Pool, cpu_count
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 import auction_ABM.auctions.cda_GS as GS
+import auction_ABM.auctions.cda_GS_vec as GS_vec
 import auction_ABM.auctions.cda_TD as TD
+import auction_ABM.runners.reports as reports
+from auction_ABM.helpers.output import get_output
 
-DPI = 300
+class GroupedMean:
+    """
+    Running mean of a column per group (e.g. per period), updated with the
+    data of one simulation at a time.
+    """
+    def __init__(self, index_name, name):
+        """
+        Initialize empty running mean with names of the index and the values
+        """
+        self.index_name = index_name
+        self.name = name
+        self.sums = pd.Series(dtype=float)
+        self.counts = pd.Series(dtype=float)
+
+    def add(self, grouped):
+        """
+        Adds the values of a grouped column (pandas SeriesGroupBy)
+        """
+        self.sums = self.sums.add(grouped.sum(), fill_value=0)
+        self.counts = self.counts.add(grouped.count(), fill_value=0)
+
+    def mean(self):
+        """
+        Returns the mean per group
+        """
+        return (self.sums / self.counts).rename(self.name).rename_axis(self.index_name)
+
+class RunningStats:
+    """
+    Running accumulators of the statistics over all simulations, such that
+    the statistics can be determined without keeping all data in memory.
+    """
+    def __init__(self):
+        """
+        Initialize empty accumulators
+        """
+        self.rmsd = GroupedMean("Quantity", "Squared error")
+        self.efficiency = GroupedMean("Period", "Efficiency")
+        self.trade = GroupedMean("Period", "Trade ratio")
+        self.dispersion = GroupedMean("Period", "Profit dispersion")
+        self.columns = ["Efficiency", "Trade ratio", "Spearman Correlation", "Spearman P-value"]
+        self.totals = dict.fromkeys(self.columns, 0.0)
+        self.counts = dict.fromkeys(self.columns, 0)
+
+    def add(self, result):
+        """
+        Adds the data of a single simulation
+        """
+        df_transactions, df_periods, _, df_periods_agents = result[:4]
+        self.rmsd.add(df_transactions.groupby("Quantity")["Squared error"])
 
-plt.style.use("seaborn-darkgrid")
+        df_periods_grouped = df_periods.groupby("Period")
+        self.efficiency.add(df_periods_grouped["Efficiency"])
+        self.trade.add(df_periods_grouped["Trade ratio"])
+
+        dispersion_agents = df_periods_agents.groupby(["ID", "Period"])["Profit dispersion"].mean()
+        self.dispersion.add(dispersion_agents.groupby("Period"))
+
+        for column in self.columns:
+            self.totals[column] += df_periods[column].sum()
+            self.counts[column] += df_periods[column].count()
+
+    def mean(self, column):
+        """
+        Returns the overall mean of a column of the end-of-period data
+        """
+        return self.totals[column] / self.counts[column] if self.counts[column] else np.nan
 
 class CDARunner:
     """
     Object to manage multiple runs in parallel for a specific set of parameters.
     """
-    def __init__(self, run_name, cda_type, N, parameters, save_output=True):
+    def __init__(
+            self, run_name, cda_type, N, parameters, save_output=True, stream=False, output="csv", plots=True,
+            workers=None
+        ):
         """
-        Initialize runner
+        Initialize runner, with stream the data of each simulation is written
+        to disk as soon as it finishes instead of keeping all data in memory.
+        The data is saved with the given output backend (csv, parquet or feather).
+        The figures and csv files of the results are rendered in worker 
+        processes, without plots the figures are skipped. Workers is the amount
+        of threads of a single simulation (sharded cda), by default all cpus 
+        for a single simulation and 1 otherwise (the simulations already run
+        in parallel).
         """
         self.cda_type = cda_type
         self.N = N
         self.parameters = parameters
         self.save_output = save_output
+        self.stream = stream
 
         name, market_id, _, _, eq, params_model, _, _, _, _, _ = parameters
         self.eq = eq
         self.params_model = params_model
+        if workers is None:
+            workers = params_model.get("workers") or (cpu_count() if N == 1 else 1)
+        params_model["workers"] = workers
+
         folder = os.path.join("results", "data", name)
         os.makedirs(folder, exist_ok=True)
         self.filename = os.path.join(folder, "{}_market_{}".format(run_name,market_id))
+        self.output = get_output(output, self.filename)
+        self.reports = reports.ReportPipeline(plots)
 
     def run_auction(self, parameters):
         """
@@ -50,6 +133,12 @@ class CDARunner:
             auction = GS.CDA(*parameters)
         elif self.cda_type.lower() == "gs evo":
             auction = GS.ReplicationByImitation(*parameters)
+        elif self.cda_type.lower() == "gs active":
+            auction = GS.ActiveSetCDA(*parameters)
+        elif self.cda_type.lower() == "gs vec":
+            auction = GS_vec.CDA(*parameters)
+        elif self.cda_type.lower() == "gs sharded":
+            auction = GS_vec.ShardedCDA(*parameters)
         elif self.cda_type.lower() == "td":
             auction = TD.CDA(*parameters)
         elif self.cda_type.lower() == "td evo":
@@ -61,6 +150,9 @@ class CDARunner:
         """
         Run all simulations in parallel.
         """
+        if self.stream:
+            return self.run_all_streaming()
+
         pool = Pool(cpu_count())
         pool_input = [(n, *self.parameters) for n in range(self.N)]
         pool_results = pool.map(self.run_auction, pool_input)
@@ -82,77 +174,106 @@ class CDARunner:
             self.analyze_rmsd_prices(df_transactions)
             mean_efficiency, mean_trade = self.efficiency_periods(df_periods)
 
-            ## ADJUST THE PROFIT DISPERSION BECAUSE DF ONLY HAS INFO ABOUT THE LAST PERIOD
             mean_profit_dispersion = self.profit_dispersion(df_periods_agents)
 
             self.equilibrium_stats(df_periods, mean_efficiency, mean_trade, mean_profit_dispersion)
+            self.reports.join()
 
-    def save_data(self, pool_results):
+    def run_all_streaming(self):
         """
-        Save data of all simulations to csv file
+        Run all simulations in parallel in chunks, the data of each simulation
+        is written to the output as soon as it finishes and the statistics
+        are updated with running accumulators, so peak memory does not depend on N.
         """
+        stats = RunningStats()
+        random_sim = np.random.randint(0, self.N)
+        chunk_size = 4 * cpu_count()
 
-        # seperate the data gathered from the simulations into different dataframes
-        data_transactions = [result[0] for result in pool_results]
-        data_periods = [result[1] for result in pool_results]
-        data_agents = [result[2] for result in pool_results]
-        data_periods_agents = [result[3] for result in pool_results]
-        df_transactions = pd.concat(data_transactions)
-        df_periods = pd.concat(data_periods)
-        df_agents = pd.concat(data_agents)
-        df_periods_agents = pd.concat(data_periods_agents)
+        pool = Pool(cpu_count())
+        for start in range(0, self.N, chunk_size):
+            pool_input = ((n, *self.parameters) for n in range(start, min(start + chunk_size, self.N)))
+            for result in pool.imap_unordered(self.run_auction, pool_input):
+                self.add_result(result, stats, random_sim)
+        pool.close()
+        pool.join()
+
+        self.save_running_stats(stats)
+        self.reports.join()
+
+    def add_result(self, result, stats, random_sim):
+        """
+        Writes the data of a single simulation to the output and adds it to
+        the running statistics
+        """
+        if not self.save_output:
+            return
 
-        if "evo" in self.cda_type.lower():
-            data_evo = [result[4] for result in pool_results]
-            df_evo = pd.concat(data_evo)
-            name = self.filename + "evo_process.csv"
-            df_evo.to_csv(name)
+        self.output.write(result)
+        stats.add(result)
 
-        # save transactions to csv
-        name = self.filename + "_transactions.csv"
-        df_transactions.to_csv(name)
+        if result[1]["ID"].iat[0] == random_sim:
+            self.plot_price_convergence(result[0], random_sim)
 
-        # save end-of-period data to csv
-        name = self.filename + "_periods.csv"
-        df_periods.to_csv(name)
+    def save_running_stats(self, stats):
+        """
+        Saves the statistics over all simulations from the running accumulators
+        """
+        if not self.save_output:
+            return
+
+        self.save_rmsd_prices(np.sqrt(stats.rmsd.mean()))
+        self.save_efficiency_periods(stats.efficiency.mean(), stats.trade.mean())
+        mean_profit_dispersion = self.save_profit_dispersion(np.sqrt(stats.dispersion.mean()))
+        self.save_general_stats(
+            stats.mean("Efficiency"), stats.mean("Trade ratio"), mean_profit_dispersion,
+            stats.mean("Spearman Correlation"), stats.mean("Spearman P-value")
+        )
 
-        # save data agents to csv
-        name = self.filename + "_agents.csv"
-        df_agents.to_csv(name)
+    def save_data(self, pool_results):
+        """
+        Save data of all simulations with the output backend
+        """
 
-        # save data agents end of period
-        name = self.filename + "_periods_agents.csv"
-        df_periods_agents.to_csv(name)
+        # seperate the data gathered from the simulations into different dataframes
+        # (transactions, end-of-period, agents, agents end of period and evolution)
+        dataframes = tuple(pd.concat(result) for result in zip(*pool_results))
+        self.output.write(dataframes)
 
-        if "evo" in self.cda_type.lower():
-            return df_transactions, df_periods, df_agents, df_periods_agents, df_evo
+        return dataframes
 
-        return df_transactions, df_periods, df_agents, df_periods_agents
+    def analyze_saved(self):
+        """
+        Analyzes the saved data of a previous run, only the columns needed
+        for the analysis are loaded from the output
+        """
+        random_sim = np.random.randint(0, self.N)
+        df_transactions = self.output.load("transactions", ["ID", "Period", "Time", "Price"], ids=[random_sim])
+        self.plot_price_convergence(df_transactions, random_sim)
+
+        self.analyze_rmsd_prices(self.output.load("transactions", ["Quantity", "Squared error"]))
+        df_periods = self.output.load(
+            "periods", ["Period", "Efficiency", "Trade ratio", "Spearman Correlation", "Spearman P-value"]
+        )
+        mean_efficiency, mean_trade = self.efficiency_periods(df_periods)
+        mean_profit_dispersion = self.profit_dispersion(
+            self.output.load("periods_agents", ["ID", "Period", "Profit dispersion"])
+        )
+        self.equilibrium_stats(df_periods, mean_efficiency, mean_trade, mean_profit_dispersion)
+        self.reports.join()
 
-    def plot_price_convergence(self, df_transactions):
+    def plot_price_convergence(self, df_transactions, random_sim=None):
         """
         Randomly selects one of the simulations to plot
         """
 
         # select data of a random simulation
-        random_sim = np.random.randint(0, self.N)
+        if random_sim is None:
+            random_sim = np.random.randint(0, self.N)
         df = df_transactions[df_transactions["ID"] == random_sim]
-        name = self.filename + "_price_convergence.pdf"
-
-        # plot price convergence for each period
-        df = df.groupby("Period")
-        fig, axes = plt.subplots(ncols=df.ngroups, sharey=True, figsize=(15,3))
-        for i, (period, d) in enumerate(df):
-            ax = d.plot(x="Time", y="Price", ax=axes[i], title="Period {}".format(i + 1))
-            ax.axhline(self.eq[0], 0, self.params_model["total_time"], c="k", ls="--", lw=0.5)
-            ax.set_xlim(0, self.params_model["total_time"])
-            ax.set_ylim(self.params_model["min_price"] - 1, self.params_model["max_price"])
-            ax.legend().remove()
-        fig.tight_layout()
-
-        # save figure and then close it
-        fig.savefig(name, dpi=DPI)
-        plt.close()
+        self.reports.plot(
+            reports.plot_price_convergence, df, self.filename + "_price_convergence.pdf", 
+            self.eq[0], self.params_model
+        )
 
     def analyze_rmsd_prices(self, df_transactions):
         """
@@ -163,17 +284,15 @@ class CDARunner:
         # try to retrieve the squared error
         df_trans_grouped = df_transactions.groupby("Quantity")
         rmse_mean = np.sqrt(df_trans_grouped["Squared error"].mean())
+        self.save_rmsd_prices(rmse_mean)
 
-        # save mean rmsd and make plot
-        rmse_mean.to_csv(self.filename + "_rmsd_prices.csv")
-        rmse_mean.plot(
-            x="Quantity", 
-            y="Squared error", 
-            title="Root Mean Squared Deviation of transaction prices"
-        )
-        plt.ylabel("Root Mean Squared Deviation")
-        plt.savefig(self.filename + "_rmsd_prices.pdf", dpi=DPI)
-        plt.close()
+    def save_rmsd_prices(self, rmse_mean):
+        """
+        Saves the mean root mean squared deviation per quantity traded to a csv
+        and plots it
+        """
+        self.reports.write_csv(rmse_mean, self.filename + "_rmsd_prices.csv")
+        self.reports.plot(reports.plot_rmsd_prices, rmse_mean, self.filename + "_rmsd_prices.pdf")
 
     def efficiency_periods(self, df_periods):
         """
@@ -181,45 +300,26 @@ class CDARunner:
         the overall mean allocative efficiency
         """
         mean_efficiency = df_periods["Efficiency"].mean()
-        df_periods_grouped = df_periods.groupby("Period")
-        mean_efficiency_periods = df_periods_grouped["Efficiency"].mean()
-        mean_efficiency_periods.to_csv(self.filename + "_efficiency_periods.csv")
-
         mean_trade = df_periods["Trade ratio"].mean()
-        mean_trade_periods = df_periods_grouped["Trade ratio"].mean()
-        mean_trade_periods.to_csv(self.filename + "_traderatio_periods.csv")
-
-        # determine y-limits
-        mean_efficiency_periods *= 100
-        mean_trade_periods *= 100
-        min_eff, max_eff = min(mean_efficiency_periods), max(mean_efficiency_periods)
-        min_trade, max_trade = min(mean_trade_periods), max(mean_trade_periods)
-
-        min_y = round(min_eff) - 10 if min_eff < min_trade else round(min_trade) - 10
-        max_y = round(max_eff) + 10 if max_eff > max_trade else round(max_trade) + 10
-
-        # make plot
-        fig = plt.figure()
-        mean_efficiency_periods.plot(
-            x="Period",
-            y="Efficiency",
-            label="Efficiency"
-        )
-        mean_trade_periods.plot(
-            x="Periods", 
-            y="Trade ratio",
-            label="Trade ratio"
+        df_periods_grouped = df_periods.groupby("Period")
+        self.save_efficiency_periods(
+            df_periods_grouped["Efficiency"].mean(), df_periods_grouped["Trade ratio"].mean()
         )
-        plt.ylabel("Percentage")
-        plt.xticks(mean_efficiency_periods.index)
-        plt.ylim(min_y, max_y)
-        plt.legend()
-        plt.title("Periodwise allocative efficency and trade ratio")
-        fig.savefig(self.filename + "_efficiency_periods.pdf", dpi=DPI)
-        plt.close(fig)
 
         return mean_efficiency, mean_trade
 
+    def save_efficiency_periods(self, mean_efficiency_periods, mean_trade_periods):
+        """
+        Saves the periodwise mean allocative efficiency and trade ratio to a
+        csv and plots them
+        """
+        self.reports.write_csv(mean_efficiency_periods, self.filename + "_efficiency_periods.csv")
+        self.reports.write_csv(mean_trade_periods, self.filename + "_traderatio_periods.csv")
+        self.reports.plot(
+            reports.plot_efficiency_periods, mean_efficiency_periods, mean_trade_periods,
+            self.filename + "_efficiency_periods.pdf"
+        )
+
     def profit_dispersion(self, df_periods_agents):
         """
         Determinse the mean profit disperion periodwise and over all periods
@@ -228,7 +328,14 @@ class CDARunner:
         mean_dispersion_agents = df_grouped["Profit dispersion"].mean()
         mean_dispersion_periods = np.sqrt(mean_dispersion_agents.groupby("Period").mean())
 
-        mean_dispersion_periods.to_csv(self.filename + "_profitdispersion_periods.csv")
+        return self.save_profit_dispersion(mean_dispersion_periods)
+
+    def save_profit_dispersion(self, mean_dispersion_periods):
+        """
+        Saves the periodwise mean profit dispersion to a csv and returns the
+        mean over all periods
+        """
+        self.reports.write_csv(mean_dispersion_periods, self.filename + "_profitdispersion_periods.csv")
         mean_profit_dispersion = mean_dispersion_periods.mean()
 
         return mean_profit_dispersion
@@ -238,11 +345,20 @@ class CDARunner:
         """
         mean_spearman = df_periods["Spearman Correlation"].mean()
         mean_spearman_pvalue = df_periods["Spearman P-value"].mean()
-        
+        self.save_general_stats(
+            mean_efficiency, mean_trade, mean_profit_dispersion, mean_spearman, mean_spearman_pvalue
+        )
+
+    def save_general_stats(
+            self, mean_efficiency, mean_trade, mean_profit_dispersion, mean_spearman, mean_spearman_pvalue
+    ):
+        """
+        Writes the overall mean statistics to a text file
+        """
         name = self.filename + "_general_stats.txt"
         with open(name, 'w') as f:
-            f.write("efficiency={}\n".format(round(mean_efficiency, 3)))
-            f.write("trade ratio={}\n".format(round(mean_trade, 2)))
-            f.write("profit dispersion={}\n".format(round(mean_profit_dispersion, 2)))
-            f.write("spearman correlation={}\n".format(round(mean_spearman, 3)))
-            f.write("spearman p-value={}\n".format(round(mean_spearman_pvalue, 3)))
\ No newline at end of file
+            f.write("efficiency={}\n".format(round(float(mean_efficiency), 3)))
+            f.write("trade ratio={}\n".format(round(float(mean_trade), 2)))
+            f.write("profit dispersion={}\n".format(round(float(mean_profit_dispersion), 2)))
+            f.write("spearman correlation={}\n".format(round(float(mean_spearman), 3)))
+            f.write("spearman p-value={}\n".format(round(float(mean_spearman_pvalue), 3)))
\ No newline at end of file
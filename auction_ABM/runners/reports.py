@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+from multiprocessing import Pool, cpu_count
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+DPI = 300
+
+plt.style.use("seaborn-darkgrid")
+
+def init_worker():
+    """
+    Initializes a worker of the report pool with the non-interactive Agg
+    backend, such that figures are rendered without a display
+    """
+    matplotlib.use("Agg")
+
+def write_csv(data, path):
+    """
+    Writes a series or dataframe to a csv
+    """
+    data.to_csv(path)
+
+def plot_price_convergence(df, path, eq_price, params_model):
+    """
+    Plots the transaction prices of a single simulation for each period
+    """
+    df = df.groupby("Period")
+    fig, axes = plt.subplots(ncols=df.ngroups, sharey=True, figsize=(15,3))
+    for i, (period, d) in enumerate(df):
+        ax = d.plot(x="Time", y="Price", ax=axes[i], title="Period {}".format(i + 1))
+        ax.axhline(eq_price, 0, params_model["total_time"], c="k", ls="--", lw=0.5)
+        ax.set_xlim(0, params_model["total_time"])
+        ax.set_ylim(params_model["min_price"] - 1, params_model["max_price"])
+        ax.legend().remove()
+    fig.tight_layout()
+
+    # save figure and then close it
+    fig.savefig(path, dpi=DPI)
+    plt.close(fig)
+
+def plot_rmsd_prices(rmse_mean, path):
+    """
+    Plots the mean root mean squared deviation per quantity traded
+    """
+    fig = plt.figure()
+    rmse_mean.plot(
+        x="Quantity",
+        y="Squared error",
+        title="Root Mean Squared Deviation of transaction prices"
+    )
+    plt.ylabel("Root Mean Squared Deviation")
+    fig.savefig(path, dpi=DPI)
+    plt.close(fig)
+
+def plot_efficiency_periods(mean_efficiency_periods, mean_trade_periods, path):
+    """
+    Plots the periodwise mean allocative efficiency and trade ratio
+    """
+
+    # determine y-limits
+    mean_efficiency_periods = mean_efficiency_periods * 100
+    mean_trade_periods = mean_trade_periods * 100
+    min_eff, max_eff = min(mean_efficiency_periods), max(mean_efficiency_periods)
+    min_trade, max_trade = min(mean_trade_periods), max(mean_trade_periods)
+
+    min_y = round(min_eff) - 10 if min_eff < min_trade else round(min_trade) - 10
+    max_y = round(max_eff) + 10 if max_eff > max_trade else round(max_trade) + 10
+
+    # make plot
+    fig = plt.figure()
+    mean_efficiency_periods.plot(
+        x="Period",
+        y="Efficiency",
+        label="Efficiency"
+    )
+    mean_trade_periods.plot(
+        x="Periods",
+        y="Trade ratio",
+        label="Trade ratio"
+    )
+    plt.ylabel("Percentage")
+    plt.xticks(mean_efficiency_periods.index)
+    plt.ylim(min_y, max_y)
+    plt.legend()
+    plt.title("Periodwise allocative efficency and trade ratio")
+    fig.savefig(path, dpi=DPI)
+    plt.close(fig)
+
+class ReportPipeline:
+    """
+    Renders the figures and csv files of the results of a run, each in a
+    separate worker process with the headless Agg backend, such that the
+    parent process does not wait for matplotlib. The figures can be skipped
+    entirely, the csv files are always written. The pool is started at the
+    first report, join waits for all reports to be written.
+    """
+    def __init__(self, plots=True, processes=None):
+        """
+        Initialize pipeline, with plots the figures are rendered as well
+        """
+        self.plots = plots
+        self.processes = processes or cpu_count()
+        self.pool = None
+        self.pending = []
+
+    def __getstate__(self):
+        # the pool stays in the process that started it (e.g. when a runner
+        # is sent to the workers of the simulations)
+        state = self.__dict__.copy()
+        state["pool"], state["pending"] = None, []
+        return state
+
+    def submit(self, func, *args):
+        """
+        Renders a report (func with its arguments) in a worker
+        """
+        if self.pool is None:
+            self.pool = Pool(self.processes, initializer=init_worker)
+        self.pending.append(self.pool.apply_async(func, args))
+
+    def write_csv(self, data, path):
+        """
+        Writes a series or dataframe to a csv in a worker
+        """
+        self.submit(write_csv, data, path)
+
+    def plot(self, func, *args):
+        """
+        Renders a figure in a worker, unless figures are skipped
+        """
+        if self.plots:
+            self.submit(func, *args)
+
+    def join(self):
+        """
+        Waits for all reports to be written and stops the pool, errors raised
+        in the workers are raised again
+        """
+        if self.pool is None:
+            return
+
+        pending, self.pending = self.pending, []
+        try:
+            for result in pending:
+                result.get()
+        finally:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
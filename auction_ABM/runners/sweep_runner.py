@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+import itertools
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+from auction_ABM.helpers.bundle import load_market
+from auction_ABM.runners.cda_runner import CDARunner, RunningStats
+from auction_ABM.runners.reports import ReportPipeline
+
+# runners of the cells of the sweep, set once in each worker of the pool
+_runners = None
+
+def init_worker(runners):
+    """
+    Initializes a worker of the pool with the runners of all cells
+    """
+    global _runners
+    _runners = runners
+
+def run_replication(job):
+    """
+    Runs a single replication (cell, n) of the sweep in a worker
+    """
+    cell, n = job
+    runner = _runners[cell]
+    return cell, runner.run_auction((n, *runner.parameters))
+
+def market_name(cda_type):
+    """
+    Returns the name of the market (GS or TD) a cda type runs on
+    """
+    return "TD" if "td" in cda_type.lower() else "GS"
+
+class SweepRunner:
+    """
+    Object to run a grid of markets, distributions of agents (parameter
+    folders) and cda types in a single pool of workers. All replications of
+    all cells are scheduled on the same pool, longest first, and the data of
+    each replication is written to the output of its cell as soon as it
+    finishes. The statistics of a cell are saved once all its replications
+    are done. The figures and csv files of all cells are rendered by a single
+    report pipeline.
+    """
+    def __init__(
+            self, market_ids, names, cda_types, N, save_output=True, log=False,
+            output="csv", seed=None, processes=None, plots=True
+        ):
+        """
+        Initialize sweep with the grid (market ids, names and cda types), the
+        amount of simulations per cell and the number of worker processes
+        """
+        self.N = N
+        self.processes = processes or cpu_count()
+        self.reports = ReportPipeline(plots, self.processes)
+        self.runners, self.costs = [], []
+
+        # the threads of a simulation (sharded cda) only get all cpus if it is the only one
+        cells = len(market_ids) * len(names) * len(cda_types)
+        workers = cpu_count() if cells * N == 1 else 1
+        for market_id, name, cda_type in itertools.product(market_ids, names, cda_types):
+            market = load_market(market_name(cda_type), market_id, name)
+            prices_buy, prices_sell, eq = market[:3]
+            params_strats, total_buyers_strats, total_sellers_strats, params_model = market[3:]
+            if seed is not None:
+                params_model["seed"] = seed
+
+            cda_params = (
+                name, market_id, prices_buy, prices_sell, eq, params_model, params_strats,
+                total_buyers_strats, total_sellers_strats, save_output, log
+            )
+            run_name = "{}_{}".format(name, cda_type.replace(" ", "_"))
+            runner = CDARunner(
+                run_name, cda_type, N, cda_params, save_output=save_output, stream=True, output=output,
+                workers=workers
+            )
+            runner.reports = self.reports
+            self.runners.append(runner)
+
+            # estimated duration of a replication: a shout per agent per time step
+            agents = sum(total_buyers_strats.values()) + sum(total_sellers_strats.values())
+            self.costs.append(params_model["periods"] * params_model["total_time"] * agents)
+
+    def jobs(self):
+        """
+        Returns all replications (cell, n) of the sweep, longest first
+        """
+        jobs = [(cell, n) for cell in range(len(self.runners)) for n in range(self.N)]
+        jobs.sort(key=lambda job: self.costs[job[0]], reverse=True)
+
+        return jobs
+
+    def run_all(self):
+        """
+        Run all replications of all cells in a single pool
+        """
+        stats = [RunningStats() for _ in self.runners]
+        random_sims = np.random.randint(0, self.N, size=len(self.runners))
+        done = [0] * len(self.runners)
+
+        pool = Pool(self.processes, initializer=init_worker, initargs=(self.runners,))
+        for cell, result in pool.imap_unordered(run_replication, self.jobs()):
+            runner = self.runners[cell]
+            runner.add_result(result, stats[cell], random_sims[cell])
+
+            done[cell] += 1
+            if done[cell] == self.N:
+                runner.save_running_stats(stats[cell])
+        pool.close()
+        pool.join()
+
+        self.reports.join()
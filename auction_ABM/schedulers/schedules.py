@@ -7,10 +7,13 @@ Description of file
 Name developers
 """
 
-import random
+import bisect
+import math
+from collections import defaultdict
 
 from mesa.time import BaseScheduler
 
+from auction_ABM.agents.trader import BUYER
 from auction_ABM.agents.buyers_GS import ZI_C_buy, Kaplan_buy, ZIP_buy
 from auction_ABM.agents.sellers_GS import ZI_C_sell, Kaplan_sell, ZIP_sell
 
@@ -18,6 +21,9 @@ class RandomGS(BaseScheduler):
     """
     Random scheduler for the simulations based on Gode and Sunder their research.
     """
+    def __init__(self, model):
+        super().__init__(model)
+        self.idle = False
 
     def get_agent(self, unique_id):
         """
@@ -29,6 +35,7 @@ class RandomGS(BaseScheduler):
         """
         Collect all active agents and randomly chooses one that will offer a price
         """
+        self.model.market_context.update()
 
         # collect active agents
         active_agents = []
@@ -62,6 +69,29 @@ class RandomGS(BaseScheduler):
             else:
                 agent.reset_no_transactions()
 
+    def idle_steps(self):
+        """
+        Returns the amount of steps (from the current one) in which no agent
+        can shout, given that none could in the last step
+        """
+        steps = math.inf
+        for agent in self.agent_buffer():
+            steps = min(steps, agent.idle_steps())
+            if steps == 0:
+                break
+
+        return steps
+
+    def skip_steps(self, steps):
+        """
+        Skips the given amount of steps without any shout
+        """
+        for agent in self.agent_buffer():
+            agent.update_no_transactions(steps)
+
+        self.steps += steps
+        self.time += steps
+
     def set_profit_dispersion(self):
         """
         Set profit dispersion of each agent
@@ -98,6 +128,7 @@ class RandomGS(BaseScheduler):
 
         # only perform step if actie agent is selected
         agent, self.model.transaction_possible = self.get_active_agent(), False
+        self.idle = agent is None
         if agent is not None:
 
             self.model.agent_last_offer = agent
@@ -124,6 +155,9 @@ class RandomGS(BaseScheduler):
             else:
                 self.model.update_best_price(agent)
 
+            if self.model.trace is not None:
+                self.model.trace.shout(self.model, agent, self.model.transaction_possible)
+
         if self.model.log:
             self.model.log_auction.info("BEFORE UPDATING PARAMETERS")
             for agent in self.agent_buffer():
@@ -143,21 +177,223 @@ class RandomGS(BaseScheduler):
 
         return self.model.transaction_possible
 
+class ActiveSetGS(RandomGS):
+    """
+    Random scheduler that keeps track of the active agents instead of checking
+    all agents each step. Agents whose activity only depends on the best bid 
+    or ask (ZI and ZI-C traders) are kept sorted on their activity threshold
+    per market side, so the active buyers (sellers) are the ones above (below)
+    the best bid (ask) and are found by bisection. Their thresholds only change
+    when they trade. Other agents are still checked every step. Note, moving
+    an agent in the sorted lists (list.insert and del) shifts the agents behind
+    it, an O(N) memmove instead of O(log N) in a tree, but this is only done
+    for the traders of a transaction and a single memmove of pointers is 
+    cheaper than the check of all agents it replaces.
+    """
+    def __init__(self, model):
+        super().__init__(model)
+        self.buyers_thresholds, self.buyers_sorted = [], []
+        self.sellers_thresholds, self.sellers_sorted = [], []
+        self.thresholds = {}
+        self.dynamic_agents = []
+        self.shouted_agents = []
+
+    def add(self, agent):
+        """
+        Adds agent to the scheduler and its index
+        """
+        super().add(agent)
+        self.index_agent(agent)
+
+    def get_index(self, agent):
+        """
+        Returns the sorted thresholds and agents of the market side of the agent
+        """
+        if agent.side == BUYER:
+            return self.buyers_thresholds, self.buyers_sorted
+
+        return self.sellers_thresholds, self.sellers_sorted
+
+    def index_agent(self, agent):
+        """
+        Inserts agent at its threshold in the index of its market side, or in 
+        the agents that are checked every step. Agents without commodities 
+        left are not indexed.
+        """
+        threshold = agent.get_activity_threshold()
+        if threshold is None:
+            self.dynamic_agents.append(agent)
+        elif agent.still_commodities():
+            thresholds, agents = self.get_index(agent)
+            position = bisect.bisect_right(thresholds, threshold)
+            thresholds.insert(position, threshold)
+            agents.insert(position, agent)
+            self.thresholds[agent.unique_id] = threshold
+
+    def reindex_agent(self, agent):
+        """
+        Moves agent to its new threshold (after a transaction)
+        """
+        threshold = self.thresholds.pop(agent.unique_id, None)
+        if threshold is None:
+            return
+
+        thresholds, agents = self.get_index(agent)
+        position = bisect.bisect_left(thresholds, threshold)
+        while agents[position] is not agent:
+            position += 1
+
+        del thresholds[position], agents[position]
+        self.index_agent(agent)
+
+    def reset_index(self):
+        """
+        Rebuilds the index for all agents
+        """
+        self.buyers_thresholds, self.buyers_sorted = [], []
+        self.sellers_thresholds, self.sellers_sorted = [], []
+        self.thresholds, self.dynamic_agents, self.shouted_agents = {}, [], []
+        for agent in self.agent_buffer():
+            self.index_agent(agent)
+
+    def get_active_agent(self):
+        """
+        Randomly chooses one of the active agents (uniformly) that will offer
+        a price
+        """
+        self.model.market_context.update()
+
+        # indexed active buyers are above the best bid, sellers below best ask
+        first_buyer = bisect.bisect_right(self.buyers_thresholds, self.model.best_bid)
+        total_buyers = len(self.buyers_sorted) - first_buyer
+        total_sellers = bisect.bisect_left(self.sellers_thresholds, self.model.best_ask)
+
+        # collect other active agents
+        active_agents = []
+        for agent in self.dynamic_agents:
+            agent.set_activity(), agent.set_in_market()
+            if agent.is_active() and agent.is_in_market():
+                active_agents.append(agent)
+
+        # none found
+        total = total_buyers + total_sellers + len(active_agents)
+        if total == 0:
+            return None
+
+        # randomly choose active agent
+        choice = self.model.random.randrange(total)
+        if choice < total_buyers:
+            agent = self.buyers_sorted[first_buyer + choice]
+        elif choice < total_buyers + total_sellers:
+            agent = self.sellers_sorted[choice - total_buyers]
+        else:
+            agent = active_agents[choice - total_buyers - total_sellers]
+
+        self.shouted_agents.append(agent)
+        return agent
+
+    def reset_offers_agents(self):
+        """
+        Reset offers of agents that shouted since the last reset and of the
+        agents checked every step to intial value.
+        """
+        for agent in self.shouted_agents:
+            agent.reset_offer()
+        for agent in self.dynamic_agents:
+            agent.reset_offer()
+
+        self.shouted_agents = []
+
+    def update_no_transactions(self, buyer_id=-1, seller_id=-1):
+        """
+        Update the number of steps in which no transaction occur for the agents
+        checked every step (ZI and ZI-C traders do not use it) and moves the 
+        agents that made a transaction to their new threshold
+        """
+        for agent in self.dynamic_agents:
+            if agent.unique_id != buyer_id and agent.unique_id != seller_id:
+                agent.update_no_transactions()
+
+        for unique_id in (buyer_id, seller_id):
+            if unique_id in self._agents:
+                agent = self.get_agent(unique_id)
+                agent.reset_no_transactions()
+                self.reindex_agent(agent)
+
+    def idle_steps(self):
+        """
+        Returns the amount of steps (from the current one) in which no agent
+        can shout, given that none could in the last step (indexed agents 
+        stay inactive as long as the best bid and ask do not change)
+        """
+        steps = math.inf
+        for agent in self.dynamic_agents:
+            steps = min(steps, agent.idle_steps())
+            if steps == 0:
+                break
+
+        return steps
+
+    def skip_steps(self, steps):
+        """
+        Skips the given amount of steps without any shout
+        """
+        for agent in self.dynamic_agents:
+            agent.update_no_transactions(steps)
+
+        self.steps += steps
+        self.time += steps
+
+    def reset_agents(self):
+        """
+        Resets all agents' attributes to their intial values, rebuilds the
+        index and reset time and step attributes scheduler
+        """
+        super().reset_agents()
+        self.reset_index()
+
+    def update_params_agents(self):
+        """
+        Update paramater of agents at the and of a time step (only agents 
+        checked every step have parameters to update)
+        """
+        for agent in self.dynamic_agents:
+            agent.update_params()
+
 class ImitationScheduler(RandomGS):
     """
     Scheduler for an evolutionary CDA tournament. The evolutionary process is 
     done by means of "replication by imitation".
     """
+    def __init__(self, model):
+        super().__init__(model)
+        self.pool = defaultdict(list)
+        self.side_ids = ([], [])
 
-    def replace_buyer(self, agent, new_strategy, params_agent):
+    def add(self, agent):
         """
-        Replace a buyer by its new strategy, keep track of its surplus and 
-        quantity and reset its parameters. Returns the newly made agent
+        Adds agent to the scheduler and to the ids of its market side
         """
+        super().add(agent)
+        self.side_ids[agent.side].append(agent.unique_id)
 
-        quantity, surplus = agent.quantity, agent.surplus
+    def draw_partners(self):
+        """
+        Randomly selects an other agent of the same market side (including 
+        itself) for all agents at once. Returns the selected agent per id
+        """
+        partners = {}
+        for ids in self.side_ids:
+            if ids:
+                draws = self.model.rng.integers(len(ids), size=len(ids))
+                partners.update(zip(ids, [self._agents[ids[i]] for i in draws]))
+
+        return partners
 
-        # make new agent
+    def new_buyer(self, agent, new_strategy):
+        """
+        Returns a new buyer with the new strategy for the place of the agent
+        """
         standard_params = [agent.unique_id, self.model, agent.valuation, self.model.eq_buyer_surplus, agent.tot_commodities]
         if new_strategy.upper() == "ZI_C":
             new_agent = ZI_C_buy(*standard_params)
@@ -168,22 +404,12 @@ class ImitationScheduler(RandomGS):
         elif new_strategy.upper() == "ZIP":
             new_agent = ZIP_buy(*standard_params, self.model.params_strats[new_strategy.upper()])
 
-        # keep track of surplus and quantity; reset agent for next period
-        new_agent.set_import_params(params_agent)
-        new_agent.quantity, new_agent.surplus = quantity, surplus
-        new_agent.reset_agent()
-
         return new_agent
 
-    def replace_seller(self, agent, new_strategy, params_agent):
+    def new_seller(self, agent, new_strategy):
         """
-        Replace a seller by its new strategy, keep track of its surplus and 
-        quantity and reset its parameters. Returns the newly made agent
+        Returns a new seller with the new strategy for the place of the agent
         """
-
-        quantity, surplus = agent.quantity, agent.surplus
-
-        # make new agent
         standard_params = [agent.unique_id, self.model, agent.valuation, self.model.eq_seller_surplus, agent.tot_commodities]
         if new_strategy.upper() == "ZI_C":
             new_agent = ZI_C_sell(*standard_params)
@@ -192,10 +418,25 @@ class ImitationScheduler(RandomGS):
         elif new_strategy.upper() == "ZIP":
             new_agent = ZIP_sell(*standard_params, self.model.params_strats[new_strategy.upper()])
 
-        # keep track of surplus and quantity; reset agent for next period
-        new_agent.set_import_params(params_agent)
-        new_agent.quantity, new_agent.surplus = quantity, surplus
-        new_agent.reset_agent()
+        return new_agent
+
+    def switch_agent(self, agent, new_strategy):
+        """
+        Returns a trader with the new strategy that takes over the place of
+        the agent: an unused trader from the pool of the strategy if there
+        is one, otherwise a new trader. The agent is returned to the pool of
+        its old strategy.
+        """
+        pool = self.pool[agent.side, new_strategy]
+        if pool:
+            new_agent = pool.pop()
+            new_agent.take_over(agent)
+        elif agent.side == BUYER:
+            new_agent = self.new_buyer(agent, new_strategy)
+        else:
+            new_agent = self.new_seller(agent, new_strategy)
+
+        self.pool[agent.side, agent.strategy].append(agent)
 
         return new_agent
 
@@ -214,9 +455,9 @@ class ImitationScheduler(RandomGS):
         elif agent.surplus < other.surplus:
 
             prob = (other.surplus - agent.surplus) / other.surplus      
-            if random.random() < prob:
+            if self.model.random.random() < prob:
 
-                if other.strategy != agent.strategy:
+                if other.code != agent.code:
                     switches += 1
                     return other.strategy, switches, other.return_import_params()
                 else:
@@ -231,7 +472,7 @@ class ImitationScheduler(RandomGS):
 
         elif agent.quantity < other.quantity:
 
-            if other.strategy != agent.strategy:
+            if other.code != agent.code:
                 switches += 1
                 return other.strategy, switches, other.return_import_params()
             else:
@@ -244,20 +485,25 @@ class ImitationScheduler(RandomGS):
     # def replace_agents(self, new_strategies, surplus_agents, quantity_agents):
     def replace_agents(self, new_strategies, params_agents):
         """
-        Replace all agents by their new strategies
+        Replace all agents by their new strategies. Agents that keep their 
+        strategy are reused, only switching agents are exchanged for a 
+        trader of their new strategy. All take over the important params of 
+        their new strategy, keep track of their surplus and quantity and 
+        are reset for the next period.
         """
-        # replace each agent by its new strategy
         for agent in self.agent_buffer():
-            if agent.market_side.lower() == "buyer":
-                new_agent = self.replace_buyer(
-                    agent, new_strategies[agent.unique_id], params_agents[agent.unique_id]
-                )
-            else:
-                new_agent = self.replace_seller(
-                    agent, new_strategies[agent.unique_id], params_agents[agent.unique_id]
-                )
-            
-            self._agents[agent.unique_id] = new_agent
+            new_strategy = new_strategies[agent.unique_id]
+            new_agent = agent
+            if new_strategy != agent.strategy:
+                self.model.strategy_counter.switch(agent.side, agent.strategy, new_strategy)
+                new_agent = self.switch_agent(agent, new_strategy)
+                self._agents[agent.unique_id] = new_agent
+
+            # keep track of surplus and quantity; reset agent for next period
+            quantity, surplus = agent.quantity, agent.surplus
+            new_agent.set_import_params(params_agents[agent.unique_id])
+            new_agent.quantity, new_agent.surplus = quantity, surplus
+            new_agent.reset_agent()
 
     def reset_agents(self):
         """
@@ -273,6 +519,7 @@ class ImitationScheduler(RandomGS):
         # their surplus and quantity, ALSO KEEP TRACK OF THEIR PARAMETERS
         new_strategies = {}
         params_agents = {}
+        partners = self.draw_partners()
         for agent in self.agent_buffer():
 
             # if current profit is better than last period then keep strategy
@@ -283,11 +530,8 @@ class ImitationScheduler(RandomGS):
                 # quantity_agents[agent.unique_id] = agent.quantity
                 continue
 
-            # randomly select other agent from same market side
-            while True:
-                other = self.model.random.choice(self.agents)
-                if agent.market_side.upper() == other.market_side.upper():
-                    break
+            # randomly selected other agent from same market side
+            other = partners[agent.unique_id]
 
             # determines which strategy to choose by means of replication by imitation
             new_strategies[agent.unique_id], switches, params_agents[agent.unique_id] = self.determine_new_strategy(
@@ -299,10 +543,7 @@ class ImitationScheduler(RandomGS):
         self.replace_agents(new_strategies, params_agents)
 
         # update the amount of period sequence with no switches
-        if switches > 0:
-            self.model.periods_no_switches = 0
-        else:
-            self.model.periods_no_switches += 1
+        self.model.strategy_counter.end_imitation(switches)
 
         self.time = 0
         self.steps = 0
@@ -7,10 +7,12 @@ Description of file
 Name developers
 """
 
-import random
+from collections import defaultdict
 
 from mesa.time import BaseScheduler
 
+from auction_ABM.agents.trader import BUYER, SELLER
+from auction_ABM.agents.zip_learner import ZIPLearner
 from auction_ABM.agents.buyers_TD import ZI_C_buy, Kaplan_buy, ZIP_buy
 from auction_ABM.agents.sellers_TD import ZI_C_sell, Kaplan_sell, ZIP_sell
 
@@ -18,6 +20,39 @@ class RandomTD(BaseScheduler):
     """
     Random scheduler for the simulations based on Gode and Sunder their research.
     """
+    def __init__(self, model):
+        super().__init__(model)
+        self.rng = model.rng
+        self.learners = []
+        self.zip_learners = None
+
+    def add(self, agent):
+        """
+        Adds agent to the scheduler, keeps track of agents with parameters 
+        to update (learning agents)
+        """
+        super().add(agent)
+        if agent.learning:
+            self.learners.append(agent)
+            self.zip_learners = None
+
+    def set_learners(self):
+        """
+        Determines the learning agents (in scheduling order)
+        """
+        self.learners = [agent for agent in self.agent_buffer() if agent.learning]
+        self.zip_learners = None
+
+    def get_zip_learners(self):
+        """
+        Returns the population-level learners of the ZIP agents per market side
+        """
+        if self.zip_learners is None:
+            buyers = [agent for agent in self.learners if agent.side == BUYER]
+            sellers = [agent for agent in self.learners if agent.side == SELLER]
+            self.zip_learners = [ZIPLearner(agents, self.rng) for agents in (buyers, sellers) if agents]
+
+        return self.zip_learners
 
     def get_agent(self, unique_id):
         """
@@ -27,9 +62,23 @@ class RandomTD(BaseScheduler):
 
     def update_params_agents(self, step_over, trade_made):
         """
-        Update paramater of agents at the and of a time step
+        Update paramater of agents after a shout or at the end of a time step.
+        Only learning agents have parameters to update and during a time step
+        their update rules only fire after a transaction, so other calls are
+        skipped.
         """
-        for agent in self.agent_buffer():
+        if not step_over and not self.model.transaction_possible:
+            return
+
+        # without a trade in the time step all units of all ZIP agents lower 
+        # their profit margin towards the last shout, done at once per market side
+        if step_over and not trade_made:
+            if self.model.agent_last_offer is not None:
+                for learner in self.get_zip_learners():
+                    learner.lower_profit_margins(self.model.agent_last_offer.offer, self.model.time)
+            return
+
+        for agent in self.learners:
             agent.update_params(step_over, trade_made)
 
     def update_no_transactions(self, buyer_id=-1, seller_id=-1):
@@ -58,6 +107,7 @@ class RandomTD(BaseScheduler):
         for agent in self.agent_buffer():
             agent.reset_agent()
 
+        self.zip_learners = None
         self.time = 0
         self.steps = 0
 
@@ -73,7 +123,7 @@ class RandomTD(BaseScheduler):
             self.model.transaction_possible = False
             agent.set_activity(), agent.set_in_market()
 
-            if agent.is_active() and agent.is_in_market() and random.random() < self.model.activation:
+            if agent.is_active() and agent.is_in_market() and self.model.random.random() < self.model.activation:
 
                 _ = agent.step()
 
@@ -86,6 +136,9 @@ class RandomTD(BaseScheduler):
                 else:
                     self.model.update_best_price(agent)
 
+                if self.model.trace is not None:
+                    self.model.trace.shout(self.model, agent, self.model.transaction_possible)
+
                 self.update_params_agents(False, trade_made)
 
         for (buyer_id, seller_id) in trade_combos:
@@ -104,6 +157,30 @@ class ImitationScheduler(RandomTD):
     Scheduler for an evolutionary CDA tournament. The evolutionary process is 
     done by means of "replication by imitation".
     """
+    def __init__(self, model):
+        super().__init__(model)
+        self.pool = defaultdict(list)
+        self.side_ids = ([], [])
+
+    def add(self, agent):
+        """
+        Adds agent to the scheduler and to the ids of its market side
+        """
+        super().add(agent)
+        self.side_ids[agent.side].append(agent.unique_id)
+
+    def draw_partners(self):
+        """
+        Randomly selects an other agent of the same market side (including 
+        itself) for all agents at once. Returns the selected agent per id
+        """
+        partners = {}
+        for ids in self.side_ids:
+            if ids:
+                draws = self.model.rng.integers(len(ids), size=len(ids))
+                partners.update(zip(ids, [self._agents[ids[i]] for i in draws]))
+
+        return partners
 
     def determine_new_strategy(self, agent, other, switches):
         """
@@ -120,9 +197,9 @@ class ImitationScheduler(RandomTD):
         elif agent.surplus < other.surplus:
 
             prob = (other.surplus - agent.surplus) / other.surplus      
-            if random.random() < prob:
+            if self.model.random.random() < prob:
 
-                if other.strategy != agent.strategy:
+                if other.code != agent.code:
                     switches += 1
                     return other.strategy, switches, other.get_import_params()
                 else:
@@ -137,7 +214,7 @@ class ImitationScheduler(RandomTD):
 
         elif agent.quantity < other.quantity:
 
-            if other.strategy != agent.strategy:
+            if other.code != agent.code:
                 switches += 1
                 return other.strategy, switches, other.get_import_params()
             else:
@@ -147,15 +224,10 @@ class ImitationScheduler(RandomTD):
         else:
             return agent.strategy, switches, agent.get_import_params()
 
-    def replace_buyer(self, agent, new_strategy, params_agent):
+    def new_buyer(self, agent, new_strategy):
         """
-        Replace a buyer by its new strategy, keep track of its surplus and 
-        quantity and reset its parameters. Returns the newly made agent
+        Returns a new buyer with the new strategy for the place of the agent
         """
-
-        quantity, surplus = agent.get_quantity_surplus()
-
-        # make new agent
         standard_params = [agent.unique_id, self.model, self.model.prices_buy, self.model.eq_buyer_surplus]
         if new_strategy.upper() == "ZI_C":
             new_agent = ZI_C_buy(*standard_params)
@@ -166,22 +238,12 @@ class ImitationScheduler(RandomTD):
         elif new_strategy.upper() == "ZIP":
             new_agent = ZIP_buy(*standard_params, self.model.params_strats[new_strategy.upper()])
 
-        # keep track of surplus and quantity; reset agent for next period
-        new_agent.set_import_params(params_agent)
-        new_agent.set_quantity_surplus(quantity, surplus)
-        new_agent.reset_agent()
-
         return new_agent
 
-    def replace_seller(self, agent, new_strategy, params_agent):
+    def new_seller(self, agent, new_strategy):
         """
-        Replace a seller by its new strategy, keep track of its surplus and 
-        quantity and reset its parameters. Returns the newly made agent
+        Returns a new seller with the new strategy for the place of the agent
         """
-
-        quantity, surplus = agent.get_quantity_surplus()
-
-        # make new agent
         standard_params = [agent.unique_id, self.model, self.model.prices_sell, self.model.eq_seller_surplus]
         if new_strategy.upper() == "ZI_C":
             new_agent = ZI_C_sell(*standard_params)
@@ -190,30 +252,52 @@ class ImitationScheduler(RandomTD):
         elif new_strategy.upper() == "ZIP":
             new_agent = ZIP_sell(*standard_params, self.model.params_strats[new_strategy.upper()])
 
-        # keep track of surplus and quantity; reset agent for next period
-        new_agent.set_import_params(params_agent)
-        new_agent.set_quantity_surplus(quantity, surplus)
-        new_agent.reset_agent()
+        return new_agent
+
+    def switch_agent(self, agent, new_strategy):
+        """
+        Returns a trader with the new strategy that takes over the place of
+        the agent: an unused trader from the pool of the strategy if there
+        is one, otherwise a new trader. The agent is returned to the pool of
+        its old strategy.
+        """
+        pool = self.pool[agent.side, new_strategy]
+        if pool:
+            new_agent = pool.pop()
+            new_agent.take_over(agent)
+        elif agent.side == BUYER:
+            new_agent = self.new_buyer(agent, new_strategy)
+        else:
+            new_agent = self.new_seller(agent, new_strategy)
+
+        self.pool[agent.side, agent.strategy].append(agent)
 
         return new_agent
 
     # def replace_agents(self, new_strategies, surplus_agents, quantity_agents):
     def replace_agents(self, new_strategies, params_agents):
         """
-        Replace all agents by their new strategies
+        Replace all agents by their new strategies. Agents that keep their 
+        strategy are reused, only switching agents are exchanged for a 
+        trader of their new strategy. All take over the important params of 
+        their new strategy, keep track of their surplus and quantity and 
+        are reset for the next period.
         """
-        # replace each agent by its new strategy
         for agent in self.agent_buffer():
-            if agent.market_side.lower() == "buyer":
-                new_agent = self.replace_buyer(
-                    agent, new_strategies[agent.unique_id], params_agents[agent.unique_id]
-                )
-            else:
-                new_agent = self.replace_seller(
-                    agent, new_strategies[agent.unique_id], params_agents[agent.unique_id]
-                )
-            
-            self._agents[agent.unique_id] = new_agent
+            new_strategy = new_strategies[agent.unique_id]
+            new_agent = agent
+            if new_strategy != agent.strategy:
+                self.model.strategy_counter.switch(agent.side, agent.strategy, new_strategy)
+                new_agent = self.switch_agent(agent, new_strategy)
+                self._agents[agent.unique_id] = new_agent
+
+            # keep track of surplus and quantity; reset agent for next period
+            quantity, surplus = agent.get_quantity_surplus()
+            new_agent.set_import_params(params_agents[agent.unique_id])
+            new_agent.set_quantity_surplus(quantity, surplus)
+            new_agent.reset_agent()
+
+        self.set_learners()
 
     def reset_agents(self):
         """
@@ -229,6 +313,7 @@ class ImitationScheduler(RandomTD):
         # their surplus and quantity, ALSO KEEP TRACK OF THEIR PARAMETERS
         new_strategies = {}
         params_agents = {}
+        partners = self.draw_partners()
         for agent in self.agent_buffer():
 
             # if current profit is better than last period then keep strategy
@@ -237,11 +322,8 @@ class ImitationScheduler(RandomTD):
                 params_agents[agent.unique_id] = agent.get_import_params()
                 continue
 
-            # randomly select other agent from same market side
-            while True:
-                other = self.model.random.choice(self.agents)
-                if agent.market_side.upper() == other.market_side.upper():
-                    break
+            # randomly selected other agent from same market side
+            other = partners[agent.unique_id]
 
             # determines which strategy to choose by means of replication by imitation
             new_strategies[agent.unique_id], switches, params_agents[agent.unique_id] = self.determine_new_strategy(
@@ -252,10 +334,7 @@ class ImitationScheduler(RandomTD):
         self.replace_agents(new_strategies, params_agents)
 
         # update the amount of period sequence with no switches
-        if switches > 0:
-            self.model.periods_no_switches = 0
-        else:
-            self.model.periods_no_switches += 1
+        self.model.strategy_counter.end_imitation(switches)
 
         self.time = 0
         self.steps = 0
\ No newline at end of file
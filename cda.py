@@ -10,23 +10,36 @@ Name developers
 import matplotlib.pyplot as plt
 
 from auction_ABM.helpers.cmd_cda import set_arguments
-from auction_ABM.helpers.data import load_demand_supply, load_parameters
+from auction_ABM.helpers.bundle import load_market
 from auction_ABM.runners.cda_runner import CDARunner
 
 if __name__ == "__main__":
 
     # retrieve command-line arguments, load demand and supply schedule 
-    # and parameters model
-    name, market_name, market_id, cda_type, N, save_output, log = set_arguments()
-    prices_buy, prices_sell, eq = load_demand_supply(market_name, market_id)
-    # print("loaded D and S")
-    params = load_parameters(market_name, market_id, name)
-    # print("loaded parameters")
-    params_strats, total_buyers_strats, total_sellers_strats, params_model = params
+    # and parameters model from the compiled market bundle, the limit prices
+    # are memory-mapped (also in the workers of the pool)
+    name, market_name, market_id, cda_type, N, save_output, log, stream, output, seed, trace, plots, analyze = set_arguments()
+    market = load_market(market_name, market_id, name)
+    prices_buy, prices_sell, eq = market[:3]
+    params_strats, total_buyers_strats, total_sellers_strats, params_model = market[3:]
+
+    # seed and trace given on the command line overrule the ones in parameters_CDA.txt
+    if seed is not None:
+        params_model["seed"] = seed
+    if trace:
+        params_model["trace"] = True
+
     cda_params = (
         name, market_id, prices_buy, prices_sell, eq, params_model, params_strats, 
         total_buyers_strats, total_sellers_strats, save_output, log
     )
 
-    cda_run = CDARunner(name, cda_type, N, cda_params, save_output=save_output)
-    cda_run.run_all()
\ No newline at end of file
+    cda_run = CDARunner(
+        name, cda_type, N, cda_params, save_output=save_output, stream=stream, output=output, plots=plots
+    )
+
+    # with analyze only the saved data of a previous run is analyzed again
+    if analyze:
+        cda_run.analyze_saved()
+    else:
+        cda_run.run_all()
@@ -8,13 +8,15 @@ Name developers
 """
 
 import os
+import sys
 
 from auction_ABM.helpers.cmd_ds import set_arguments
 from auction_ABM.helpers.data import load_parameters
+from auction_ABM.helpers.seeds import replication_rngs
 import auction_ABM.helpers.demand_and_supply as ds
 
 if __name__ == "__main__":
-    name, market_type, market_id = set_arguments()
+    name, market_type, market_id, batch, seed, eq_price, eq_quantity = set_arguments()
     params = load_parameters(market_type, market_id, name)
     params_strats, total_buyers_strats, total_sellers_strats, params_model = params
 
@@ -23,10 +25,21 @@ if __name__ == "__main__":
         total_buyers += buyers
         total_sellers += sellers
 
+    # generate a batch of markets without plotting them
+    if batch > 1:
+        ds.generate_markets(
+            market_type, list(range(market_id, market_id + batch)), name,
+            params_model["min_price"], params_model["max_price"], 
+            total_buyers, total_sellers, params_model["commodities"], 
+            eq_price, eq_quantity, seed
+        )
+        sys.exit()
+
     ds_results = ds.generate_random_DS(
         params_model["min_price"], params_model["max_price"], 
         total_buyers, total_sellers,
-        params_model["commodities"]
+        params_model["commodities"], eq_price, eq_quantity,
+        None if seed is None else replication_rngs(seed, market_id)[1]
     )
     prices_buy, prices_sell, all_prices_buy, all_prices_sell, equilibrium = ds_results
 
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Description of file
+
+Name developers
+"""
+
+from auction_ABM.helpers.cmd_sweep import set_arguments
+from auction_ABM.runners.sweep_runner import SweepRunner
+
+if __name__ == "__main__":
+
+    # retrieve command-line arguments and run all combinations of markets,
+    # names and cda types in a single pool
+    market_ids, names, cda_types, N, save_output, log, output, seed, processes, plots = set_arguments()
+    sweep = SweepRunner(
+        market_ids, names, cda_types, N, save_output=save_output, log=log, 
+        output=output, seed=seed, processes=processes, plots=plots
+    )
+    sweep.run_all()